@@ -1,59 +1,159 @@
+import os
 import simpy
-import json
 from compute import compute_priority
+from publisher import publish_result
+from task_log import task_finish_log
+from metrics import metrics_for
+from realtime import perform
 
-# 最大等待时间，超出即从 H0 切换到 H1 模式（使用 USB 摄像头）
+# 最大等待时间，超出即从 H0 切换到 H1 模式（使用回退链中的下一个传感器，默认 USB 摄像头）
 MAX_WAIT_TIME = 2.0
 
-# 全局任务完成日志
-task_finish_log = []
+# --- Preemption semantics ---
+# "restart": a preempted task is dispatched again from scratch (full duration,
+#            new MAX_WAIT_TIME window, may switch sensor).
+# "resume":  a preempted task waits on the same sensor at its original priority
+#            and arrival order and only runs its remaining service time.
+# PREEMPTION_PENALTY (seconds) is added to every run after a preemption to
+# model context-switch / sensor re-setup cost, in both modes. A penalty not
+# yet spent when the run is preempted again is not carried over.
+# The task log records first and last start in both modes; wait is measured
+# to the first start.
+PREEMPTION_MODES = ("restart", "resume")
+PREEMPTION_MODE = os.environ.get("PREEMPTION_MODE", "restart")
+PREEMPTION_PENALTY = float(os.environ.get("PREEMPTION_PENALTY", "0"))
 
-def execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors):
-    sensor_csi = next(s for s in sensors if s.name == "CSI")
-    sensor_usb = next(s for s in sensors if s.name == "USB")
+
+def set_preemption_mode(mode, penalty=None):
+    global PREEMPTION_MODE, PREEMPTION_PENALTY
+    if mode not in PREEMPTION_MODES:
+        raise ValueError(f"Unknown preemption mode '{mode}', expected one of {PREEMPTION_MODES}")
+    PREEMPTION_MODE = mode
+    if penalty is not None:
+        PREEMPTION_PENALTY = float(penalty)
+    return PREEMPTION_MODE, PREEMPTION_PENALTY
+
+
+def request_in_arrival_order(resource, priority, arrival):
+    """
+    Priority request that queues by the task's original arrival time instead
+    of the time of this (re-)request, so a resumed task keeps its place
+    among tasks of equal priority.
+    """
+    req = resource.request(priority=priority)
+    req.time = arrival
+    req.key = (priority, arrival, not req.preempt)
+    if not req.triggered:
+        resource.queue.sort(key=lambda e: e.key)
+    return req
+
+
+def execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors, arrival=None, preemptions=0, first_start=None):
+    if arrival is None:
+        arrival = env.now
+    # `sensors` is a sensors.SensorPool: O(1) lookups by name / capability
+    sensor_primary = sensors.match(task)
+    sensor_fallback = sensors.fallback_for(sensor_primary)
 
     priority = compute_priority(task)
+    duration = task['duration'] + (PREEMPTION_PENALTY if preemptions else 0.0)
+    start_time = None
 
-    with sensor_csi.resource.request(priority=priority) as req:
+    with sensor_primary.resource.request(priority=priority) as req:
         wait_start = env.now
-        result = yield req | env.timeout(MAX_WAIT_TIME)
+        if sensor_fallback is None:
+            result = yield req
+        else:
+            result = yield req | env.timeout(MAX_WAIT_TIME)
 
-        if req in result:
+        if sensor_fallback is None or req in result:
             try:
-                print(f"[{env.now:.2f}] {task['id']} starts on CSI")
-                yield env.timeout(task['duration'])
-                print(f"[{env.now:.2f}] {task['id']} finishes on CSI")
-                selected_sensor = "CSI"
+                start_time = env.now
+                if first_start is None:
+                    first_start = start_time
+                print(f"[{env.now:.2f}] {task['id']} starts on {sensor_primary.name}")
+                yield from perform(env, task, sensor_primary, duration)
+                print(f"[{env.now:.2f}] {task['id']} finishes on {sensor_primary.name}")
+                selected_sensor = sensor_primary.name
             except simpy.Interrupt:
-                print(f"[{env.now:.2f}] {task['id']} was preempted on CSI — rescheduling...")
-                env.process(execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors))
+                preempted(mqtt_client, MQTT_TOPIC, env, task, sensors, sensor_primary,
+                          priority, arrival, first_start, start_time, duration, preemptions)
                 return
         else:
-            print(f"[{env.now:.2f}] {task['id']} waited too long, switching to USB")
-            with sensor_usb.resource.request(priority=priority) as usb_req:
+            print(f"[{env.now:.2f}] {task['id']} waited too long, switching to {sensor_fallback.name}")
+            metrics = metrics_for(env)
+            if metrics is not None:
+                metrics.count("fallbacks", f"{sensor_primary.name}->{sensor_fallback.name}")
+            with sensor_fallback.resource.request(priority=priority) as fallback_req:
                 try:
-                    yield usb_req
-                    print(f"[{env.now:.2f}] {task['id']} starts on USB")
-                    yield env.timeout(task['duration'])
-                    print(f"[{env.now:.2f}] {task['id']} finishes on USB")
-                    selected_sensor = "USB"
+                    yield fallback_req
+                    start_time = env.now
+                    if first_start is None:
+                        first_start = start_time
+                    print(f"[{env.now:.2f}] {task['id']} starts on {sensor_fallback.name}")
+                    yield from perform(env, task, sensor_fallback, duration)
+                    print(f"[{env.now:.2f}] {task['id']} finishes on {sensor_fallback.name}")
+                    selected_sensor = sensor_fallback.name
                 except simpy.Interrupt:
-                    print(f"[{env.now:.2f}] {task['id']} was preempted on USB — rescheduling...")
-                    env.process(execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors))
+                    preempted(mqtt_client, MQTT_TOPIC, env, task, sensors, sensor_fallback,
+                              priority, arrival, first_start, start_time, duration, preemptions)
                     return
 
-    mqtt_client.publish(MQTT_TOPIC, json.dumps({
-        "task_id": task["id"],
-        "sensor": selected_sensor,
-        "finish_time": env.now,
-        "description": task["description"],
-        "safety": task["safety_str"],
-        "realtime": task["realtime"],
-        "duration": task["duration"]
-    }))
-
-    task_finish_log.append({
-        "task_id": task["id"],
-        "sensor": selected_sensor,
-        "finish_time": round(env.now, 2)
-    })
+    publish_result(mqtt_client, MQTT_TOPIC, task, selected_sensor, env.now)
+
+    task_finish_log.record(task["id"], selected_sensor, arrival, start_time, env.now, preemptions, first_start)
+
+
+def remaining_work(work, run_start, now, penalty):
+    """Service time left of `work` after running from `run_start` to `now`, the first `penalty` seconds being overhead."""
+    return work - min(work, max(0.0, now - run_start - penalty))
+
+
+def preempted(mqtt_client, MQTT_TOPIC, env, task, sensors, sensor, priority, arrival, first_start, start_time,
+              duration, preemptions):
+    """Reschedule a task interrupted on `sensor` according to PREEMPTION_MODE."""
+    if PREEMPTION_MODE == "resume":
+        # Preempted between grant and start: nothing done yet
+        remaining = task['duration'] if start_time is None else \
+            remaining_work(task['duration'], start_time, env.now, duration - task['duration'])
+        print(f"[{env.now:.2f}] {task['id']} was preempted on {sensor.name} — {remaining:.2f}s left, re-queued")
+        env.process(resume_task(mqtt_client, MQTT_TOPIC, env, task, sensor, priority, arrival,
+                                first_start, remaining, preemptions + 1))
+    else:
+        print(f"[{env.now:.2f}] {task['id']} was preempted on {sensor.name} — rescheduling...")
+        env.process(execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors, arrival, preemptions + 1, first_start))
+
+
+def resume_task(mqtt_client, MQTT_TOPIC, env, task, sensor, priority, arrival, first_start, remaining, preemptions):
+    """
+    Run the remaining service time of a preempted task on the sensor it was
+    preempted from. `remaining` is service time only; each resumed run adds
+    PREEMPTION_PENALTY once on top.
+    """
+    start_time = None
+    while True:
+        with request_in_arrival_order(sensor.resource, priority, arrival) as req:
+            resumed = None
+            try:
+                yield req
+                resumed = start_time = env.now
+                if first_start is None:
+                    first_start = resumed
+                run = remaining + PREEMPTION_PENALTY
+                print(f"[{env.now:.2f}] {task['id']} resumes on {sensor.name} ({run:.2f}s left)")
+                yield from perform(env, task, sensor, run)
+                print(f"[{env.now:.2f}] {task['id']} finishes on {sensor.name}")
+                break
+            except simpy.Interrupt:
+                if resumed is not None:
+                    remaining = remaining_work(remaining, resumed, env.now, PREEMPTION_PENALTY)
+                preemptions += 1
+                print(f"[{env.now:.2f}] {task['id']} was preempted on {sensor.name} — {remaining:.2f}s left, re-queued")
+
+    publish_result(mqtt_client, MQTT_TOPIC, task, sensor.name, env.now)
+
+    task_finish_log.record(task["id"], sensor.name, arrival, start_time, env.now, preemptions, first_start)
+
+
+def dispatch_mixed_critical_task(mqtt_client, MQTT_TOPIC, env, task, sensors):
+    env.process(execute_task(mqtt_client, MQTT_TOPIC, env, task, sensors))
@@ -1,28 +1,44 @@
 import simpy
-import requests
-import json
-import paho.mqtt.client as mqtt
+import weakref
+from publisher import publish_result
+from realtime import perform
+from task_log import task_finish_log
+
+
+# --- Shared FIFO sensor pool ---
+# One pool per simulation environment. Free sensors sit in a simpy.Store; every
+# fair task issues exactly one get(), and the Store serves pending gets strictly
+# in arrival order. A waiting task is only woken when a sensor is put back.
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_fair_pool(env, sensors):
+    pool = _pools.get(env)
+    if pool is None:
+        # One token per capacity slot, so a sensor with capacity n serves n tasks at once
+        slots = [sensor for sensor in sensors for _ in range(sensor.resource.capacity)]
+        pool = simpy.Store(env, capacity=len(slots))
+        pool.items.extend(slots)
+        _pools[env] = pool
+    return pool
 
 
 def dispatch_fair_task(mqtt_client,MQTT_TOPIC,env, task, sensors):
+    pool = get_fair_pool(env, sensors)
+    arrival = env.now
+
     def fair_task():
-        while True:
-            for sensor in sensors:
-                if sensor.resource.count == 0:
-                    with sensor.resource.request() as req:
-                        yield req
-                        print(f"[{env.now:.2f}] {task['id']} starts on {sensor.name} (FIFO)")
-                        yield env.timeout(task['duration'])
-                        print(f"[{env.now:.2f}] {task['id']} finishes on {sensor.name} (FIFO)")
-                        mqtt_client.publish(MQTT_TOPIC, json.dumps({
-                            "task_id": task["id"],
-                            "sensor": sensor.name,
-                            "finish_time": env.now,
-                            "description": task["description"],
-                            "safety": task["safety_str"],
-                            "realtime": task["realtime"],
-                            "duration": task["duration"]
-                        }))
-                        return
-            yield env.timeout(0.1)
-    env.process(fair_task())
\ No newline at end of file
+        sensor = yield pool.get()
+        try:
+            with sensor.resource.request() as req:
+                yield req
+                start_time = env.now
+                print(f"[{env.now:.2f}] {task['id']} starts on {sensor.name} (FIFO)")
+                yield from perform(env, task, sensor, task['duration'])
+                print(f"[{env.now:.2f}] {task['id']} finishes on {sensor.name} (FIFO)")
+                publish_result(mqtt_client, MQTT_TOPIC, task, sensor.name, env.now)
+                task_finish_log.record(task["id"], sensor.name, arrival, start_time, env.now)
+        finally:
+            # Hand the sensor to the next task in arrival order
+            pool.put(sensor)
+    env.process(fair_task())
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import mmap
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from task_loader import parse_task_element
+
+# --- AASX package layout ---
+AAS_NS = "https://admin-shell.io/aas/3/0"
+ORIGIN_REL = "http://admin-shell.io/aasx/relationships/aasx-origin"
+SPEC_REL = "http://admin-shell.io/aasx/relationships/aas-spec"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+TASK_SUBMODEL = "Task"
+STRATEGY_SUBMODEL = "Scheduler"
+STRATEGY_ELEMENT = "simpy"
+
+# Parsed task tables, keyed by package content; bump CACHE_VERSION when the parsed shape changes
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".aasx_cache")
+CACHE_VERSION = "1"
+
+
+def _tag(name):
+    return f"{{{AAS_NS}}}{name}"
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _rels_targets(package, rels_path, rel_type):
+    if rels_path not in package.namelist():
+        return []
+    root = ET.fromstring(package.read(rels_path))
+    base = posixpath.dirname(posixpath.dirname(rels_path))
+    targets = []
+    for rel in root.iter(f"{{{RELS_NS}}}Relationship"):
+        if rel.get("Type") != rel_type:
+            continue
+        target = rel.get("Target")
+        if target.startswith("/"):
+            targets.append(target.lstrip("/"))
+        else:
+            targets.append(posixpath.normpath(posixpath.join(base, target)))
+    return targets
+
+
+# --- Locate the AAS spec part(s) through the package relationships ---
+def find_spec_parts(package):
+    specs = []
+    for origin in _rels_targets(package, "_rels/.rels", ORIGIN_REL):
+        origin_rels = posixpath.join(posixpath.dirname(origin), "_rels", posixpath.basename(origin) + ".rels")
+        specs.extend(_rels_targets(package, origin_rels, SPEC_REL))
+    if not specs:
+        specs = [name for name in package.namelist() if name.endswith(".xml") and name.startswith("aasx/")]
+    return specs
+
+
+# --- XML submodel element -> BaSyx JSON shape ---
+def _lang_strings(elem):
+    if elem is None:
+        return []
+    return [{"language": s.findtext(_tag("language")), "text": s.findtext(_tag("text"))} for s in elem]
+
+
+def element_to_json(elem):
+    kind = _local(elem.tag)
+    data = {
+        "idShort": elem.findtext(_tag("idShort")),
+        "modelType": kind[0].upper() + kind[1:],
+        "description": _lang_strings(elem.find(_tag("description"))),
+    }
+    value = elem.find(_tag("value"))
+    if kind in ("submodelElementCollection", "submodelElementList"):
+        data["value"] = [element_to_json(child) for child in (value if value is not None else [])]
+    else:
+        data["value"] = value.text if value is not None else None
+    return data
+
+
+# --- Lazy package access ---
+class _MappedFile(mmap.mmap):
+    # zipfile wants seekable(), which mmap only has from Python 3.13
+    def seekable(self):
+        return True
+
+
+class _Package:
+    """AASX zip opened through a read-only memory map; parts are decompressed only when read."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._map = _MappedFile(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.zip = zipfile.ZipFile(self._map)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for resource in ("zip", "_map", "_file"):
+            obj = getattr(self, resource, None)
+            if obj is not None:
+                obj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def package_fingerprint(package, parts):
+    """Content key of the given parts from the zip directory (names, CRC-32s, sizes); reads no part data."""
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    for name in sorted(parts):
+        info = package.getinfo(name)
+        digest.update(f"{name}:{info.CRC:08x}:{info.file_size};".encode())
+    return digest.hexdigest()
+
+
+def _iter_target_submodels(stream, wanted):
+    """
+    Stream-parse an AAS XML environment and yield (idShort, element) for
+    each submodel in `wanted`. Everything else is discarded as soon as it
+    is complete, and parsing stops once all wanted submodels were seen.
+    """
+    remaining = set(wanted)
+    path = []
+    current = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            path.append(_local(elem.tag))
+            continue
+        name = path.pop()
+        depth = len(path)
+        if name == "idShort" and depth == 3 and path[1] == "submodels":
+            current = elem.text
+        elif name == "submodel" and depth == 2 and path[1] == "submodels":
+            if current in remaining:
+                remaining.discard(current)
+                yield current, elem
+                if not remaining:
+                    return
+            current = None
+            elem.clear()
+        elif depth == 1:
+            # assetAdministrationShells / conceptDescriptions / finished submodels list
+            elem.clear()
+
+
+def _submodel_elements(submodel):
+    elements = submodel.find(_tag("submodelElements"))
+    return [element_to_json(e) for e in (elements if elements is not None else [])]
+
+
+def read_submodels(path, id_shorts):
+    """{idShort: BaSyx-style element dicts} for the requested submodels, in one streaming pass."""
+    result = {}
+    with _Package(path) as package:
+        for spec in find_spec_parts(package.zip):
+            with package.zip.open(spec) as stream:
+                for id_short, submodel in _iter_target_submodels(stream, set(id_shorts) - set(result)):
+                    result[id_short] = _submodel_elements(submodel)
+            if len(result) == len(set(id_shorts)):
+                break
+    return result
+
+
+def read_submodel_elements(path, id_short):
+    """Return the submodel elements of submodel `id_short` as BaSyx-style JSON dicts."""
+    return read_submodels(path, [id_short]).get(id_short, [])
+
+
+# --- Disk cache of parsed task tables ---
+def _cache_file(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _read_cached(cache_dir, key):
+    try:
+        with open(_cache_file(cache_dir, key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(cache_dir, key, data):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = _cache_file(cache_dir, key) + f".{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_file, _cache_file(cache_dir, key))
+
+
+# --- Task and strategy helpers ---
+def load_task_data_from_aasx(path, submodel=TASK_SUBMODEL, cache_dir=CACHE_DIR):
+    """
+    {task idShort: task values} in the shape fetch_task_data_from_basyx
+    returns. Cached on disk under a key derived from the package content,
+    so an unchanged package is neither parsed nor decompressed again.
+    """
+    key = None
+    if cache_dir:
+        with _Package(path) as package:
+            fingerprint = package_fingerprint(package.zip, find_spec_parts(package.zip))
+        key = hashlib.sha256(f"{fingerprint}:{submodel}".encode()).hexdigest()[:32]
+        cached = _read_cached(cache_dir, key)
+        if cached is not None:
+            return cached
+    task_data = {
+        element["idShort"]: parse_task_element(element)
+        for element in read_submodel_elements(path, submodel)
+        if element["modelType"] == "SubmodelElementCollection"
+    }
+    if key is not None:
+        _write_cached(cache_dir, key, task_data)
+    return task_data
+
+
+def load_strategy_from_aasx(path, submodel=STRATEGY_SUBMODEL, element=STRATEGY_ELEMENT, default="fair"):
+    for e in read_submodel_elements(path, submodel):
+        if e["idShort"] == element and e["value"]:
+            return e["value"].strip().lower()
+    return default
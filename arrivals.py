@@ -0,0 +1,134 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from offline import record_to_task
+from task_loader import map_safety_level
+
+# --- Parameters ---
+ARRIVAL_RATE = 0.5          # tasks per simulated second (Poisson)
+ASIL_MIX = {"A": 0.4, "B": 0.3, "C": 0.2, "D": 0.1}
+DURATION_MEAN = 2.0         # lognormal service time, seconds
+DURATION_SIGMA = 0.5
+CHUNK = 4096                # synthetic arrivals drawn per numpy batch
+TASK_FIELDS = ("duration", "Duration", "safety", "safety_str", "Safety_level", "realtime", "Timing_criticality")
+
+
+# --- Arrival streams: iterables of (arrival_time, task) ---
+# Traces are read one line at a time, so a day-long trace costs constant memory.
+def task_from_record(record, known):
+    """
+    Task for one trace record: inline fields make a new task, a bare id
+    refers to a known one. ValueError for a record without a string id,
+    with an unknown bare id or with unusable fields.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a task record, got {type(record).__name__}")
+    task_id = record.get("id") or record.get("task_id")
+    if not isinstance(task_id, str) or not task_id:
+        raise ValueError("record has no task id (a non-empty string \"id\")")
+    if any(field in record for field in TASK_FIELDS):
+        try:
+            task = record_to_task(record)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"task '{task_id}': {e}") from None
+        task["id"] = task_id
+        return task
+    task = known.get(task_id)
+    if task is None:
+        raise ValueError(f"unknown task '{task_id}' and no inline task fields")
+    return task
+
+
+def _trace_task(record, known):
+    try:
+        return task_from_record(record, known)
+    except ValueError as e:
+        print(f"⚠️ Skipping trace record: {e}")
+        return None
+
+
+def read_jsonl_arrivals(path, known=None):
+    """{"time": 1.5, "id": "Task3"} or a full flat task record with "time" per line."""
+    known = known or {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            task = _trace_task(record, known)
+            if task is not None:
+                yield float(record.get("time", record.get("arrival_time", 0.0))), task
+
+
+def read_csv_arrivals(path, known=None):
+    """CSV with a header: time,id[,safety,realtime,duration,description]."""
+    known = known or {}
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            record = {key: value for key, value in record.items() if value not in (None, "")}
+            task = _trace_task(record, known)
+            if task is not None:
+                yield float(record.get("time", record.get("arrival_time", 0.0))), task
+
+
+def read_arrivals(path, known=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        return read_jsonl_arrivals(path, known)
+    if ext == ".csv":
+        return read_csv_arrivals(path, known)
+    raise ValueError(f"Unsupported arrival trace '{path}', expected .jsonl or .csv")
+
+
+def plan_arrivals(arrival_plan, known):
+    """The legacy [(time, task_id), ...] plan as an arrival stream, via one id index."""
+    for arrival_time, task_id in arrival_plan:
+        task = known.get(task_id)
+        if task is None:
+            print(f"⚠️ Arrival plan refers to unknown task '{task_id}', skipped")
+            continue
+        yield arrival_time, task
+
+
+def synthetic_arrivals(seed=0, rate=ARRIVAL_RATE, n_tasks=None, asil_mix=ASIL_MIX,
+                       duration_mean=DURATION_MEAN, duration_sigma=DURATION_SIGMA, start=0.0):
+    """Poisson arrivals with random ASIL level, timing criticality and lognormal duration; endless if n_tasks is None."""
+    rng = np.random.default_rng(seed)
+    levels = list(asil_mix)
+    probabilities = np.array([asil_mix[level] for level in levels], dtype=float)
+    probabilities /= probabilities.sum()
+    mu = np.log(duration_mean) - duration_sigma ** 2 / 2
+    now = start
+    produced = 0
+    while n_tasks is None or produced < n_tasks:
+        size = CHUNK if n_tasks is None else min(CHUNK, n_tasks - produced)
+        gaps = rng.exponential(1.0 / rate, size)
+        safety = rng.choice(levels, size=size, p=probabilities)
+        realtime = rng.integers(1, 5, size=size)
+        durations = np.round(rng.lognormal(mu, duration_sigma, size), 2)
+        for i in range(size):
+            now += float(gaps[i])
+            produced += 1
+            yield now, {
+                "id": f"Task{produced}",
+                "safety": map_safety_level(str(safety[i])),
+                "safety_str": str(safety[i]),
+                "realtime": int(realtime[i]),
+                "duration": float(max(durations[i], 0.01)),
+                "description": "synthetic"
+            }
+
+
+# --- SimPy process feeding the dispatchers ---
+def arrival_process(env, arrivals, dispatch_at):
+    """
+    Walk an arrival stream in time order, calling dispatch_at(task) at each
+    arrival time. Only the current arrival is held in memory.
+    """
+    for arrival_time, task in arrivals:
+        if arrival_time > env.now:
+            yield env.timeout(arrival_time - env.now)
+        dispatch_at(task)
@@ -0,0 +1,318 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aas_middleware
+
+from rest_cache import watch_persistence
+from task_loader import get_session, MAX_WORKERS, REQUEST_TIMEOUT
+from task_log import StreamingStats
+
+# ========== 配置 ==========
+BASYX_ENV_URL = os.environ.get("BASYX_ENV_URL")  # sync is off unless set, e.g. http://localhost:8081
+DEBOUNCE = 0.5               # writes within this window after the first one are pushed together
+RETRY_INTERVAL = 5.0         # first retry of a failed push; doubles per failed attempt ...
+MAX_RETRY_INTERVAL = 300.0   # ... up to this
+MAX_IN_FLIGHT = MAX_WORKERS  # concurrent requests, at most the shared session's pool size
+# idShorts aas_pydantic generates with a fresh uuid on every serialization
+GENERATED_ID_SHORT = re.compile(r"^(list|tuple|set|temp_id_short_attribute)_[0-9a-f]{32}$")
+COLLECTIONS = ("SubmodelElementCollection",)
+
+
+def b64_id(identifier):
+    """BaSyx v3 path encoding of an AAS / submodel id (base64url, no padding)."""
+    return base64.urlsafe_b64encode(identifier.encode()).decode().rstrip("=")
+
+
+def _stable_id_shorts(elements, path, renames):
+    """Map generated uuid idShorts to a hash of the element's position, so serializations compare equal."""
+    for index, element in enumerate(elements):
+        id_short = element.get("idShort")
+        if id_short and GENERATED_ID_SHORT.match(id_short):
+            prefix = id_short.rsplit("_", 1)[0]
+            renames[id_short] = f"{prefix}_{hashlib.md5(f'{path}/{index}'.encode()).hexdigest()}"
+            id_short = renames[id_short]
+        if isinstance(element.get("value"), list) and element["value"] and isinstance(element["value"][0], dict):
+            _stable_id_shorts(element["value"], f"{path}/{id_short or index}", renames)
+
+
+def _renamed(value, renames):
+    # Generated idShorts are also referenced from embedded data specifications
+    if isinstance(value, dict):
+        return {key: _renamed(item, renames) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_renamed(item, renames) for item in value]
+    if isinstance(value, str):
+        return renames.get(value, value)
+    return value
+
+
+def serialize_model(model):
+    """(shell JSON, [submodel JSON, ...]) of one middleware AAS, in BaSyx v3 JSON form."""
+    environment = aas_middleware.formatting.AasJsonFormatter().serialize(aas_middleware.DataModel.from_models(model))
+    renames = {}
+    for submodel in environment["submodels"]:
+        _stable_id_shorts(submodel.get("submodelElements", []), submodel["id"], renames)
+    if renames:
+        environment = _renamed(environment, renames)
+    return environment["assetAdministrationShells"][0], environment["submodels"]
+
+
+# ========== 元素级差异 ==========
+def _without(element, key):
+    return {k: v for k, v in element.items() if k != key}
+
+
+def diff_elements(old, new, path=""):
+    """
+    Operations turning the element list `old` into `new`:
+    ("put", idShortPath, element), ("post", idShortPath, element), ("delete", idShortPath, None).
+    Collections with the same children are diffed recursively; any other
+    change replaces the element, so lists and reshaped collections go as a whole.
+    """
+    old_by_id = {e.get("idShort"): e for e in old}
+    new_by_id = {e.get("idShort"): e for e in new}
+    ops = []
+    for id_short, element in new_by_id.items():
+        element_path = f"{path}.{id_short}" if path else id_short
+        previous = old_by_id.get(id_short)
+        if previous is None:
+            ops.append(("post", element_path, element))
+        elif previous == element:
+            continue
+        elif (element.get("modelType") in COLLECTIONS and previous.get("modelType") == element.get("modelType")
+              and _without(previous, "value") == _without(element, "value")
+              and [e.get("idShort") for e in previous.get("value") or []]
+              == [e.get("idShort") for e in element.get("value") or []]):
+            ops.extend(diff_elements(previous.get("value") or [], element.get("value") or [], element_path))
+        else:
+            ops.append(("put", element_path, element))
+    for id_short in old_by_id.keys() - new_by_id.keys():
+        ops.append(("delete", f"{path}.{id_short}" if path else id_short, None))
+    return ops
+
+
+def _apply(elements, op, element_path, element):
+    """Apply one successful operation to a pushed element list (path relative to `elements`)."""
+    head, _, rest = element_path.partition(".")
+    for index, current in enumerate(elements):
+        if current.get("idShort") != head:
+            continue
+        if rest:
+            _apply(current.setdefault("value", []), op, rest, element)
+        elif op == "delete":
+            del elements[index]
+        else:
+            elements[index] = element
+        return
+    if not rest and op != "delete":
+        elements.append(element)
+
+
+# ========== 同步引擎 ==========
+class BasyxSync:
+    """
+    Keeps the persisted AAS of middleware data models aligned with a BaSyx
+    AAS environment. Writes to a model (REST, telemetry, update_value) mark
+    it dirty; after DEBOUNCE seconds all dirty models are serialized, diffed
+    at submodel-element level against what BaSyx last acknowledged and only
+    the changed elements are sent, with at most MAX_IN_FLIGHT requests
+    in flight on the shared keep-alive session. Failed pushes are retried
+    with exponential backoff; only changes between reachable and failing
+    are logged.
+    """
+
+    def __init__(self, middleware, data_model_names, base_url=BASYX_ENV_URL, debounce=DEBOUNCE,
+                 max_in_flight=MAX_IN_FLIGHT):
+        if not base_url:
+            raise ValueError("BaSyx sync needs a base_url (set BASYX_ENV_URL)")
+        self.middleware = middleware
+        self.data_model_names = set(data_model_names)
+        self.base_url = base_url.rstrip("/")
+        self.debounce = debounce
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="basyx-sync")
+        self._pushed_shells = {}      # aas id -> shell JSON as BaSyx has it
+        self._pushed_submodels = {}   # submodel id -> submodel JSON as BaSyx has it
+        self._dirty = {}              # (data model, model id) -> monotonic time of first unsynced write
+        self._flush_handle = None
+        self._lock = asyncio.Lock()
+        self._retry_interval = RETRY_INTERVAL
+        self._failing = False
+        self._last_error = None
+        self.lag = StreamingStats()
+        self.requests = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.bytes_full = 0           # what re-uploading the whole shells would have sent
+
+    def install(self):
+        watch_persistence(self.middleware, self._on_write)
+        self.middleware.add_callback("on_start_up", self.start)
+        self.middleware.add_callback("on_shutdown", self.stop)
+        return self
+
+    async def start(self):
+        """Initial sync of every persisted model of the watched data models."""
+        for connection_info in list(self.middleware.persistence_registry.connections):
+            self._on_write(connection_info)
+
+    async def stop(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._dirty:
+            await self.flush()
+        if self._flush_handle is not None:  # last push failed; not retried after shutdown
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self.executor.shutdown(wait=True)
+
+    # ---------- 合并写入 ----------
+    def _on_write(self, connection_info):
+        if connection_info.data_model_name not in self.data_model_names:
+            return
+        self._dirty.setdefault((connection_info.data_model_name, connection_info.model_id), time.monotonic())
+        self._schedule(self.debounce)
+
+    def _schedule(self, delay):
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(delay, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """Push every dirty model now."""
+        self._flush_handle = None
+        async with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            results = await asyncio.gather(*(self._sync_model(data_model_name, model_id)
+                                             for data_model_name, model_id in dirty))
+            now = time.monotonic()
+            for key, ok in zip(dirty, results):
+                if ok:
+                    self.lag.add(now - dirty[key])
+                else:
+                    self._dirty.setdefault(key, dirty[key])
+            if not all(results):
+                if not self._failing:
+                    print(f"⚠️ BaSyx sync to {self.base_url} failing ({self._last_error}), retrying with backoff")
+                    self._failing = True
+                self._schedule(self._retry_interval)
+                self._retry_interval = min(self._retry_interval * 2, MAX_RETRY_INTERVAL)
+            elif results:
+                if self._failing:
+                    print(f"✅ BaSyx sync to {self.base_url} recovered")
+                    self._failing = False
+                self._retry_interval = RETRY_INTERVAL
+
+    # ---------- HTTP ----------
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        response = get_session().request(method, f"{self.base_url}{path}", data=data, timeout=REQUEST_TIMEOUT,
+                                         headers={"Content-Type": "application/json"} if data else None)
+        self.requests += 1
+        self.bytes_sent += len(data or b"")
+        if method == "GET" and response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json() if method == "GET" else None
+
+    async def _call(self, method, path, body=None):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._request, method, path, body)
+
+    # ---------- 单个模型 ----------
+    async def _sync_model(self, data_model_name, model_id):
+        try:
+            model = await self.middleware.get_value(data_model_name, model_id)
+        except KeyError:
+            model = None
+        try:
+            if model is None:
+                await self._delete_model(model_id)
+                return True
+            shell, submodels = serialize_model(model)
+            self.bytes_full += len(json.dumps(shell)) + sum(len(json.dumps(s)) for s in submodels)
+            results = await asyncio.gather(*(self._sync_submodel(submodel) for submodel in submodels))
+            return await self._sync_shell(shell) and all(results)
+        except Exception as e:
+            self.failures += 1
+            self._last_error = f"{data_model_name}/{model_id}: {e}"
+            return False
+
+    async def _sync_shell(self, shell):
+        path = f"/shells/{b64_id(shell['id'])}"
+        if shell["id"] not in self._pushed_shells:
+            pushed = await self._call("GET", path)
+            if pushed is None:
+                await self._call("POST", "/shells", shell)
+                self._pushed_shells[shell["id"]] = shell
+                return True
+            self._pushed_shells[shell["id"]] = pushed
+        if self._pushed_shells[shell["id"]] != shell:
+            await self._call("PUT", path, shell)
+            self._pushed_shells[shell["id"]] = shell
+        return True
+
+    async def _sync_submodel(self, submodel):
+        submodel_id = submodel["id"]
+        path = f"/submodels/{b64_id(submodel_id)}"
+        if submodel_id not in self._pushed_submodels:
+            pushed = await self._call("GET", path)
+            if pushed is None:
+                await self._call("POST", "/submodels", submodel)
+                self._pushed_submodels[submodel_id] = submodel
+                return True
+            self._pushed_submodels[submodel_id] = pushed
+        pushed = self._pushed_submodels[submodel_id]
+        if _without(pushed, "submodelElements") != _without(submodel, "submodelElements"):
+            await self._call("PUT", path, submodel)
+            self._pushed_submodels[submodel_id] = submodel
+            return True
+
+        ops = diff_elements(pushed.get("submodelElements") or [], submodel.get("submodelElements") or [])
+        results = await asyncio.gather(*(self._element_op(path, op, element_path, element)
+                                         for op, element_path, element in ops), return_exceptions=True)
+        # Only what BaSyx acknowledged becomes the new baseline; failed elements are diffed again next time
+        elements = pushed.setdefault("submodelElements", [])
+        failed = None
+        for (op, element_path, element), result in zip(ops, results):
+            if isinstance(result, Exception):
+                failed = result
+            else:
+                _apply(elements, op, element_path, element)
+        if failed is not None:
+            raise failed
+        return True
+
+    async def _element_op(self, path, op, element_path, element):
+        if op == "post":
+            await self._call("POST", f"{path}/submodel-elements", element)
+        elif op == "put":
+            await self._call("PUT", f"{path}/submodel-elements/{element_path}", element)
+        else:
+            await self._call("DELETE", f"{path}/submodel-elements/{element_path}")
+
+    async def _delete_model(self, model_id):
+        shell = self._pushed_shells.pop(model_id, None)
+        if shell is None:
+            return
+        for reference in shell.get("submodels") or []:
+            submodel_id = reference["keys"][-1]["value"]
+            self._pushed_submodels.pop(submodel_id, None)
+            await self._call("DELETE", f"/submodels/{b64_id(submodel_id)}")
+        await self._call("DELETE", f"/shells/{b64_id(model_id)}")
+
+    def stats(self):
+        return {
+            "lag": self.lag.summary() if self.lag.count else {"count": 0},  # empty sketches are NaN
+            "pending": len(self._dirty),
+            "failing": self._failing,
+            "requests": self.requests,
+            "failures": self.failures,
+            "bytes_sent": self.bytes_sent,
+            "bytes_full": self.bytes_full,
+        }
@@ -0,0 +1,317 @@
+import asyncio
+import threading
+import time
+
+import cv2
+from fastapi import Response
+
+BOUNDARY = b"frame"
+
+# ========== 客户端画质/帧率策略 ==========
+# Requested values are clamped and snapped to these steps so that clients
+# asking for similar profiles share one cached encode.
+MAX_FPS = 30.0
+MIN_FPS = 1.0
+WIDTH_STEPS = (160, 320, 640, 1280, 1920)
+QUALITY_STEPS = (30, 50, 70, 85, 95)
+DEFAULT_QUALITY = 95  # cv2.imencode default
+# Keep the device open this long after the last viewer leaves
+IDLE_TIMEOUT = 10.0
+# Snapshots: a cached frame older than this is refreshed first; long-poll wait limit
+SNAPSHOT_MAX_AGE = 1.0
+SNAPSHOT_TIMEOUT = 5.0
+
+
+def mjpeg_part(jpeg):
+    return (b'--' + BOUNDARY + b'\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+
+def _snap(value, steps):
+    return min(steps, key=lambda step: abs(step - value))
+
+
+class StreamProfile:
+    """
+    Per-client stream settings from ?fps=&width=&quality=. With `adaptive`,
+    the frame interval (and, once at MIN_FPS, the quality) follows how fast
+    the client drains its socket.
+    """
+
+    def __init__(self, fps=None, width=None, quality=None, adaptive=True):
+        self.fps = min(max(fps, MIN_FPS), MAX_FPS) if fps else None
+        self.width = _snap(width, WIDTH_STEPS) if width else None
+        self.quality = _snap(quality, QUALITY_STEPS) if quality else None
+        self.adaptive = adaptive
+        self.interval = 1.0 / self.fps if self.fps else 0.0
+        self._send_time = 0.0
+
+    @property
+    def key(self):
+        if self.quality in (None, DEFAULT_QUALITY) and self.width is None:
+            return None
+        return self.width, self.quality or DEFAULT_QUALITY
+
+    def record_send(self, seconds):
+        if not self.adaptive:
+            return
+        self._send_time = 0.8 * self._send_time + 0.2 * seconds
+        base = 1.0 / self.fps if self.fps else 0.0
+        budget = max(self.interval, 1.0 / MAX_FPS)
+        if self._send_time > 0.8 * budget:
+            # Client can't keep up: slow down first, then drop quality
+            if self.interval < 1.0 / MIN_FPS:
+                self.interval = min(max(self.interval * 1.25, 1.0 / MAX_FPS), 1.0 / MIN_FPS)
+            else:
+                current = self.quality or DEFAULT_QUALITY
+                lower = [q for q in QUALITY_STEPS if q < current]
+                if lower:
+                    self.quality = lower[-1]
+                    self._send_time = 0.0
+        elif self._send_time < 0.3 * budget and self.interval > base:
+            self.interval = max(self.interval / 1.1, base)
+
+
+# ========== 单采集、单编码的帧广播 ==========
+class FrameBroadcaster:
+    """
+    One capture-and-encode worker per camera. The latest JPEG (already framed
+    as a multipart chunk) sits in a shared slot with a sequence number;
+    subscribers wait for a newer sequence number, so a slow client simply
+    skips frames instead of stalling the producer. The source is opened on
+    the first subscriber and closed `idle_timeout` seconds after the last one
+    leaves.
+    """
+
+    def __init__(self, source, name=None, idle_timeout=IDLE_TIMEOUT):
+        self.source = source
+        self.name = name or source.name
+        self.idle_timeout = idle_timeout
+        self.seq = 0
+        self.frame = None
+        self.jpeg = None
+        self.chunk = None
+        self.frame_time = 0.0
+        # Distinguishes sequence numbers across restarts in ETags
+        self.epoch = format(int(time.time() * 1000), "x")
+        # (width, quality) -> (seq, chunk); one encode per profile per frame
+        self._variants = {}
+        self._variant_locks = {}
+        self._subscribers = 0
+        self._running = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self._device_lock = threading.Lock()
+        # asyncio side: one pending Event per event loop, fired from the capture thread
+        self._loop_events = {}
+        # Called as fn(frame, jpeg) on the capture thread after each encode
+        self._observers = []
+
+    def add_observer(self, fn):
+        self._observers.append(fn)
+        return fn
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            self._cond.notify_all()
+            if self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    def _publish(self, frame, jpeg):
+        with self._cond:
+            self.frame = frame
+            self.frame_time = time.monotonic()
+            self.jpeg = jpeg
+            self.chunk = mjpeg_part(jpeg)
+            self.seq += 1
+            self._cond.notify_all()
+        self._wake_async()
+
+    def _wake_async(self):
+        with self._cond:
+            loops = list(self._loop_events)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fire_loop_event, loop)
+            except RuntimeError:
+                # Event loop already closed
+                with self._cond:
+                    self._loop_events.pop(loop, None)
+
+    def _fire_loop_event(self, loop):
+        with self._cond:
+            event = self._loop_events.pop(loop, None)
+        if event is not None:
+            event.set()
+
+    def _loop_event(self, loop):
+        with self._cond:
+            event = self._loop_events.get(loop)
+            if event is None:
+                event = self._loop_events[loop] = asyncio.Event()
+            return event
+
+    def _run(self):
+        failed = False
+        with self._device_lock:
+            try:
+                self.source.open()
+                while True:
+                    with self._cond:
+                        if self._subscribers == 0:
+                            # Idle: stop reading, close unless someone comes back in time
+                            if not self._cond.wait_for(lambda: self._subscribers > 0, self.idle_timeout):
+                                break
+                    frame = self.source.read()
+                    if frame is None:
+                        print(f"⚠️ {self.name}: no frame from source, stopping capture")
+                        failed = True
+                        break
+                    ok, buffer = cv2.imencode('.jpg', frame)
+                    if ok:
+                        jpeg = buffer.tobytes()
+                        self._publish(frame, jpeg)
+                        for observer in self._observers:
+                            observer(frame, jpeg)
+            except Exception as e:
+                print(f"❌ {self.name}: capture failed: {e}")
+                failed = True
+            finally:
+                self.source.close()
+        with self._cond:
+            self._thread = None
+            if self._subscribers > 0 and not failed:
+                # Someone subscribed while we were shutting down
+                self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+                self._thread.start()
+            else:
+                self._running = False
+                self._cond.notify_all()
+        if not self._running:
+            self._wake_async()
+
+    def latest(self):
+        with self._cond:
+            return self.seq, self.jpeg
+
+    def etag(self, seq):
+        return f'"{self.epoch}-{seq}"'
+
+    async def async_wait_for_frame(self, after_seq):
+        """Wait for a frame newer than `after_seq`; None if capture stopped. Never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Register before re-checking, so a frame published in between still wakes us
+            event = self._loop_event(loop)
+            with self._cond:
+                if self.seq > after_seq:
+                    return self.seq, self.chunk
+                if not self._running:
+                    return None
+            await event.wait()
+
+    def cached_variant(self, key):
+        """(seq, chunk) at (width, quality) if already encoded for the current frame, else None."""
+        with self._cond:
+            cached = self._variants.get(key)
+            return cached if cached is not None and cached[0] >= self.seq else None
+
+    def encode_variant(self, key):
+        """Chunk for the current frame at (width, quality), encoded at most once per frame."""
+        with self._cond:
+            seq, frame = self.seq, self.frame
+            cached = self._variants.get(key)
+            lock = self._variant_locks.setdefault(key, threading.Lock())
+        if cached is not None and cached[0] >= seq:
+            return cached
+        with lock:
+            cached = self._variants.get(key)
+            if cached is not None and cached[0] >= seq:
+                return cached
+            width, quality = key
+            if width is not None and width < frame.shape[1]:
+                height = round(frame.shape[0] * width / frame.shape[1])
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            variant = (seq, mjpeg_part(buffer.tobytes()))
+            self._variants[key] = variant
+            return variant
+
+    async def async_frames(self, profile=None):
+        """MJPEG multipart async generator; holds no threadpool worker per viewer."""
+        loop = asyncio.get_running_loop()
+        self.subscribe()
+        try:
+            last_seq = self.seq
+            next_time = 0.0
+            while True:
+                if profile is not None and profile.interval:
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                item = await self.async_wait_for_frame(last_seq)
+                if item is None:
+                    break
+                last_seq, chunk = item
+                if profile is None:
+                    yield chunk
+                    continue
+                if profile.key is not None:
+                    # Only the first viewer of a profile per frame pays for a thread hop
+                    variant = self.cached_variant(profile.key)
+                    if variant is None:
+                        variant = await loop.run_in_executor(None, self.encode_variant, profile.key)
+                    last_seq, chunk = variant
+                start = time.monotonic()
+                next_time = start + profile.interval
+                yield chunk
+                profile.record_send(time.monotonic() - start)
+        finally:
+            self.unsubscribe()
+
+    async def snapshot(self, after=None, max_age=SNAPSHOT_MAX_AGE, timeout=SNAPSHOT_TIMEOUT):
+        """
+        Latest already-encoded JPEG as (seq, jpeg). With `after`, wait for a
+        frame newer than that sequence number. None on timeout.
+        """
+        self.subscribe()
+        try:
+            with self._cond:
+                if after is not None and after > self.seq:
+                    # Sequence number from before a restart (new epoch): answer like a plain snapshot
+                    after = None
+                fresh = self.jpeg is not None and time.monotonic() - self.frame_time <= max_age
+                target = self.seq if after is None else after
+            if after is None and fresh:
+                return self.latest()
+            try:
+                item = await asyncio.wait_for(self.async_wait_for_frame(target), timeout)
+            except asyncio.TimeoutError:
+                return None
+            return self.latest() if item is not None else None
+        finally:
+            self.unsubscribe()
+
+
+# ========== 快照接口 ==========
+async def snapshot_response(broadcaster, if_none_match=None, after=None):
+    """JPEG snapshot with ETag / X-Frame-Seq; 304 if the client already has it, 204 if long-poll timed out."""
+    item = await broadcaster.snapshot(after=after)
+    if item is None:
+        return Response(status_code=204 if after is not None else 503)
+    seq, jpeg = item
+    headers = {"ETag": broadcaster.etag(seq), "X-Frame-Seq": str(seq), "Cache-Control": "no-cache"}
+    if if_none_match is not None and broadcaster.etag(seq) in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
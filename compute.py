@@ -1,5 +1,85 @@
+import json
+import os
 
+import numpy as np
 
-def compute_priority(task):
-    return -(0.5 * task["safety"] + 0.5 * task["realtime"] - 0.1 * task["duration"])
+# --- Priority weights ---
+# priority = -(w_safety × safety + w_realtime × realtime − w_duration × duration)
+# Override without code changes via PRIORITY_WEIGHTS="0.5,0.5,0.1" or a JSON
+# file {"safety": .., "realtime": .., "duration": ..} passed to load_priority_weights().
+DEFAULT_WEIGHTS = (0.5, 0.5, 0.1)
 
+# Maximum wait before start per timing criticality level (see Task submodel):
+# 4 = hard (≤100 ms), 3 = firm (≤1 s), 2 = soft (≤5 s), 1 = no deadline
+DEADLINES = {4: 0.1, 3: 1.0, 2: 5.0, 1: float("inf")}
+
+
+def _weights_from_env():
+    value = os.environ.get("PRIORITY_WEIGHTS")
+    if not value:
+        return DEFAULT_WEIGHTS
+    w_safety, w_realtime, w_duration = (float(w) for w in value.split(","))
+    return w_safety, w_realtime, w_duration
+
+
+WEIGHTS = _weights_from_env()
+
+
+def set_priority_weights(w_safety, w_realtime, w_duration):
+    global WEIGHTS
+    WEIGHTS = (float(w_safety), float(w_realtime), float(w_duration))
+    return WEIGHTS
+
+
+def load_priority_weights(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return set_priority_weights(data["safety"], data["realtime"], data["duration"])
+
+
+def compute_priority(task, weights=None):
+    # The cached priority is only valid for the weights it was computed with
+    if weights is None and "priority" in task and task.get("priority_weights") == WEIGHTS:
+        return task["priority"]
+    w_safety, w_realtime, w_duration = weights or WEIGHTS
+    return -(w_safety * task["safety"] + w_realtime * task["realtime"] - w_duration * task["duration"])
+
+
+# --- Batch API ---
+def task_columns(tasks):
+    """Safety/realtime/duration columns of a task table as float arrays."""
+    n = len(tasks)
+    safety = np.fromiter((t["safety"] for t in tasks), dtype=float, count=n)
+    realtime = np.fromiter((t["realtime"] for t in tasks), dtype=float, count=n)
+    duration = np.fromiter((t["duration"] for t in tasks), dtype=float, count=n)
+    return safety, realtime, duration
+
+
+def compute_priorities(safety, realtime, duration, weights=None):
+    """
+    Vectorized compute_priority. `weights` may be a single (w_safety,
+    w_realtime, w_duration) triple or an (m, 3) array, in which case the
+    result is an (m, n) matrix with one row per weight setting.
+    """
+    w = np.asarray(weights if weights is not None else WEIGHTS, dtype=float)
+    columns = np.stack([np.asarray(safety, dtype=float),
+                        np.asarray(realtime, dtype=float),
+                        -np.asarray(duration, dtype=float)])
+    return -(w @ columns)
+
+
+def precompute_priorities(tasks, weights=None):
+    """
+    Cache each task's priority in task["priority"] once at load time (single
+    weight triple), with the weights used in task["priority_weights"].
+    """
+    loaded = [t for t in tasks if t.get("safety") is not None and t.get("realtime") is not None
+              and t.get("duration") is not None]
+    if not loaded:
+        return np.empty(0)
+    weights = tuple(float(w) for w in (weights if weights is not None else WEIGHTS))
+    priorities = compute_priorities(*task_columns(loaded), weights=weights)
+    for task, priority in zip(loaded, priorities.tolist()):
+        task["priority"] = priority
+        task["priority_weights"] = weights
+    return priorities
@@ -1,28 +1,175 @@
+import os
+import heapq
+import weakref
 import simpy
-import requests
-import json
-import paho.mqtt.client as mqtt
+from publisher import publish_result
+from realtime import perform
+from task_log import task_finish_log
+from aasx import read_submodel_elements
+from sensors import SENSOR_AASX
 
 
+# --- Energy cost model ---
+# Per sensor: power while executing a task (W), power while idle (W) and the
+# energy to bring an idle sensor back into operation (J). Read from an
+# "EnergyConsumption" submodel of the sensor AAS when it has one:
+#   ActivePower, IdlePower, SwitchingEnergy  (xs:double properties)
+ENERGY_SUBMODEL = "EnergyConsumption"
+ACTIVE_POWER = 1.0
+IDLE_POWER = 0.1
+SWITCHING_ENERGY = 0.5
+# Energy-equivalent cost of one second of extra queueing (J/s): waking an idle
+# sensor pays off once the wait on the busy sensor would cost more than that
+LATENCY_WEIGHT = float(os.environ.get("ENERGY_LATENCY_WEIGHT", "1.0"))
+
+
+class EnergyModel:
+    def __init__(self, active_power=ACTIVE_POWER, idle_power=IDLE_POWER, switching_energy=SWITCHING_ENERGY):
+        self.active_power = active_power
+        self.idle_power = idle_power
+        self.switching_energy = switching_energy
+
+    @classmethod
+    def from_elements(cls, elements):
+        """From BaSyx-style submodel element dicts (REST response or aasx.read_submodel_elements)."""
+        values = {e["idShort"]: e.get("value") for e in elements}
+        model = cls()
+        for field, id_short in (("active_power", "ActivePower"), ("idle_power", "IdlePower"),
+                                ("switching_energy", "SwitchingEnergy")):
+            if values.get(id_short) not in (None, ""):
+                setattr(model, field, float(values[id_short]))
+        return model
+
+    @classmethod
+    def from_aasx(cls, path, submodel=ENERGY_SUBMODEL):
+        return cls.from_elements(read_submodel_elements(path, submodel))
+
+
+def load_energy_models(sources=SENSOR_AASX):
+    """{sensor name: EnergyModel} from the sensor AASX files; defaults where a file or submodel is missing."""
+    models = {}
+    for name, path in sources.items():
+        try:
+            models[name] = EnergyModel.from_aasx(path)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ No energy model for {name} from {path}: {e}")
+            models[name] = EnergyModel()
+    return models
+
+
+ENERGY_MODELS = None
+
+
+def set_energy_models(models):
+    global ENERGY_MODELS
+    ENERGY_MODELS = models
+    return models
+
+
+def get_energy_models():
+    if ENERGY_MODELS is None:
+        set_energy_models(load_energy_models())
+    return ENERGY_MODELS
+
+
+# --- Expected-finish-time index ---
+# One per simulation environment. Sensors with queued work sit in a min-heap
+# on their expected finish time (now + sum of remaining durations), idle ones
+# in a min-heap on active power. Each dispatch looks at the two heap tops, so
+# selection is O(log S) in the number of sensors.
+_loads = weakref.WeakKeyDictionary()
+
+
+class SensorLoad:
+    def __init__(self, env, sensors, models):
+        self.env = env
+        self.sensors = {s.name: s for s in sensors}
+        self.models = {s.name: models.get(s.name) or EnergyModel() for s in sensors}
+        self.finish = {s.name: env.now for s in sensors}
+        self.idle_since = {s.name: env.now for s in sensors}
+        self.energy = {s.name: 0.0 for s in sensors}
+        self.busy = []
+        self.idle = [(self.models[name].active_power, name) for name in self.sensors]
+        heapq.heapify(self.idle)
+
+    def _settle(self):
+        """Move sensors whose work is done to the idle heap, dropping stale busy entries."""
+        now = self.env.now
+        while self.busy:
+            finish, name = self.busy[0]
+            if self.finish[name] != finish:
+                heapq.heappop(self.busy)
+            elif finish <= now:
+                heapq.heappop(self.busy)
+                self.idle_since[name] = finish
+                heapq.heappush(self.idle, (self.models[name].active_power, name))
+            else:
+                break
+
+    def select(self, duration):
+        """Pick the sensor with the lowest energy + latency cost for a task of `duration`."""
+        self._settle()
+        now = self.env.now
+        best_busy = best_idle = None
+        if self.busy:
+            finish, name = self.busy[0]
+            model = self.models[name]
+            best_busy = (model.active_power * duration + LATENCY_WEIGHT * (finish - now), name)
+        if self.idle:
+            name = self.idle[0][1]
+            model = self.models[name]
+            best_idle = (model.switching_energy + model.active_power * duration, name)
+        if best_idle is not None and (best_busy is None or best_idle[0] < best_busy[0]):
+            heapq.heappop(self.idle)
+            name = best_idle[1]
+            model = self.models[name]
+            self.energy[name] += model.idle_power * (now - self.idle_since[name]) + model.switching_energy
+        else:
+            name = best_busy[1]
+        self.assign(name, duration)
+        return self.sensors[name]
+
+    def assign(self, name, duration):
+        sensor = self.sensors[name]
+        self.finish[name] = max(self.finish[name], self.env.now) + duration / sensor.resource.capacity
+        self.energy[name] += self.models[name].active_power * duration
+        heapq.heappush(self.busy, (self.finish[name], name))
+
+    def total_energy(self):
+        """Energy used so far (J), including idle draw up to now."""
+        self._settle()
+        now = self.env.now
+        idle = {name for _, name in self.idle}
+        return sum(self.energy[name] + (self.models[name].idle_power * (now - self.idle_since[name])
+                                        if name in idle else 0.0)
+                   for name in self.sensors)
+
+
+def get_sensor_load(env, sensors):
+    load = _loads.get(env)
+    if load is None:
+        load = _loads[env] = SensorLoad(env, sensors, get_energy_models())
+    return load
+
+
+def energy_used(env):
+    """Sensor energy (J) accounted by the energy-aware dispatcher in `env`; None if it never dispatched there."""
+    load = _loads.get(env)
+    return None if load is None else load.total_energy()
+
 
 # --- Energy-aware scheduling ---
 def dispatch_energy_aware_task(mqtt_client,MQTT_TOPIC,env, task, sensors):
-    def estimate(sensor):
-        return len(sensor.resource.queue) + sensor.resource.count
-    sensor = min(sensors, key=estimate)
+    load = get_sensor_load(env, sensors)
+    sensor = load.select(task['duration'])
+    arrival = env.now
     def energy_task():
         with sensor.resource.request() as req:
             yield req
+            start_time = env.now
             print(f"[{env.now:.2f}] {task['id']} starts on {sensor.name} (energy-aware)")
-            yield env.timeout(task['duration'])
+            yield from perform(env, task, sensor, task['duration'])
             print(f"[{env.now:.2f}] {task['id']} finishes on {sensor.name} (energy-aware)")
-            mqtt_client.publish(MQTT_TOPIC, json.dumps({
-                "task_id": task["id"],
-                "sensor": sensor.name,
-                "finish_time": env.now,
-                "description": task["description"],
-                "safety": task["safety_str"],
-                "realtime": task["realtime"],
-                "duration": task["duration"]
-            }))
+            publish_result(mqtt_client, MQTT_TOPIC, task, sensor.name, env.now)
+            task_finish_log.record(task["id"], sensor.name, arrival, start_time, env.now)
     env.process(energy_task())
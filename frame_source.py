@@ -0,0 +1,181 @@
+import os
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+
+# ========== 帧源接口 ==========
+class FrameSource(ABC):
+    """
+    Where frames come from. open() is only called by the capture worker when
+    the first viewer subscribes, read() returns a BGR frame or None when the
+    source is exhausted, close() releases the device.
+    """
+
+    name = "source"
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def read(self):
+        """The next BGR frame, or None when the source is exhausted."""
+
+    def close(self):
+        pass
+
+
+class OpenCVSource(FrameSource):
+    """USB / V4L2 camera read through cv2.VideoCapture."""
+
+    def __init__(self, index):
+        self.index = index
+        self.name = f"opencv:{index}"
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+
+    def read(self):
+        if self.cap is None or not self.cap.isOpened():
+            return None
+        success, frame = self.cap.read()
+        return frame if success else None
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class PiCameraSource(FrameSource):
+    """CSI camera read through picamera2, converted to BGR for OpenCV."""
+
+    def __init__(self, size=(640, 480)):
+        self.size = size
+        self.name = "picamera2"
+        self.picam2 = None
+
+    def open(self):
+        # Imported here so the app can be imported on machines without picamera2
+        from picamera2 import Picamera2
+        self.picam2 = Picamera2()
+        self.picam2.configure(self.picam2.create_video_configuration(main={"size": self.size}))
+        self.picam2.start()
+
+    def read(self):
+        frame = self.picam2.capture_array()
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+    def close(self):
+        if self.picam2 is not None:
+            self.picam2.stop()
+            self.picam2.close()
+            self.picam2 = None
+
+
+class VideoFileSource(FrameSource):
+    """Replays a recorded video file, paced to its frame rate; loops by default."""
+
+    def __init__(self, path, loop=True, realtime=True):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.name = f"file:{path}"
+        self.cap = None
+        self._interval = 0.0
+        self._next = 0.0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self._interval = 1.0 / fps if self.realtime and fps > 0 else 0.0
+        self._next = time.monotonic()
+
+    def read(self):
+        success, frame = self.cap.read()
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read()
+        if not success:
+            return None
+        if self._interval:
+            self._next += self._interval
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next = time.monotonic()
+        return frame
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class SyntheticSource(FrameSource):
+    """Generated test pattern (moving gradient plus frame counter); fps=0 means as fast as possible."""
+
+    def __init__(self, width=640, height=480, fps=25.0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.name = f"synthetic:{width}x{height}@{fps:g}"
+        self._count = 0
+        self._next = 0.0
+        self._base = None
+
+    def open(self):
+        x = np.linspace(0, 255, self.width, dtype=np.float32)
+        y = np.linspace(0, 255, self.height, dtype=np.float32)[:, None]
+        self._base = np.dstack([np.broadcast_to(x, (self.height, self.width)),
+                                np.broadcast_to(y, (self.height, self.width)),
+                                np.full((self.height, self.width), 128, dtype=np.float32)]).astype(np.uint8)
+        self._count = 0
+        self._next = time.monotonic()
+
+    def read(self):
+        if self.fps:
+            self._next += 1.0 / self.fps
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next = time.monotonic()
+        self._count += 1
+        frame = np.roll(self._base, self._count % self.width, axis=1)
+        cv2.putText(frame, str(self._count), (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        return frame
+
+    def close(self):
+        self._base = None
+
+
+# ========== 从配置字符串创建帧源 ==========
+def make_source(spec):
+    """
+    "opencv:0", "picamera2" / "picamera2:640x480", "file:/path/video.mp4",
+    "synthetic" / "synthetic:1280x720@30".
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "opencv":
+        return OpenCVSource(int(arg or 0))
+    if kind == "picamera2":
+        width, height = (int(v) for v in (arg or "640x480").split("x"))
+        return PiCameraSource(size=(width, height))
+    if kind == "file":
+        return VideoFileSource(arg)
+    if kind == "synthetic":
+        size, _, fps = (arg or "640x480@25").partition("@")
+        width, height = (int(v) for v in size.split("x"))
+        return SyntheticSource(width, height, float(fps or 25))
+    raise ValueError(f"Unknown frame source '{spec}'")
+
+
+def source_from_env(var, default):
+    """Frame source from environment variable `var` (see make_source), else `default`."""
+    spec = os.environ.get(var)
+    return make_source(spec) if spec else default
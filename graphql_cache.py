@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import json
+from collections import OrderedDict
+
+import graphene
+from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse, print_ast
+from starlette.background import BackgroundTasks
+from starlette.responses import Response
+from starlette_graphene3 import GraphQLApp, make_graphiql_handler
+
+from aas_middleware.middleware.graphql_routers import GraphQLRouter
+from aas_pydantic.aas_model import Submodel
+
+from rest_cache import watch_persistence
+
+# ========== 配置 ==========
+QUERY_CACHE_SIZE = 256       # cached query results per data model, oldest evicted first
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_query(query):
+    """Canonical text of a query-only document, or None if it has a mutation/subscription or does not parse."""
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    for definition in document.definitions:
+        if isinstance(definition, OperationDefinitionNode) and definition.operation != OperationType.QUERY:
+            return None
+    return print_ast(document)
+
+
+# ========== 每个请求一次的批量加载 ==========
+class ModelLoader:
+    """
+    Dataloader for one GraphQL request: every persisted model of the data
+    model is provided once, all connectors concurrently, and grouped by
+    type. All root fields of the request share that one load, and submodel
+    fields are answered from the submodels of the loaded AAS.
+    """
+
+    def __init__(self, middleware, data_model_name):
+        self.middleware = middleware
+        self.data_model_name = data_model_name
+        self._load = None
+
+    async def _loaded(self):
+        if self._load is None:
+            self._load = asyncio.ensure_future(self._fetch())
+        return await self._load
+
+    async def models(self):
+        """{type name: [persisted model, ...]}"""
+        return (await self._loaded())[0]
+
+    async def submodels(self):
+        """{submodel type name: [submodel, ...]} contained in the persisted models."""
+        return (await self._loaded())[1]
+
+    async def _fetch(self):
+        registry = self.middleware.persistence_registry
+        connector_ids = [connector_id for connection_info, connector_id in registry.connections.items()
+                         if connection_info.data_model_name == self.data_model_name]
+        values = await asyncio.gather(*(registry.get_connector(connector_id).provide()
+                                        for connector_id in connector_ids))
+        models = {}
+        submodels = {}
+        for connector_id, value in zip(connector_ids, values):
+            if value is None:
+                continue
+            models.setdefault(registry.connection_types[connector_id].__name__, []).append(value)
+            for field_name in type(value).model_fields:
+                contained = getattr(value, field_name, None)
+                if isinstance(contained, Submodel):
+                    submodels.setdefault(type(contained).__name__, []).append(contained)
+        return models, submodels
+
+
+def _as_type(model, value):
+    return value if isinstance(value, model) else model.model_validate(value.model_dump())
+
+
+class BatchedGraphQLRouter(GraphQLRouter):
+    """GraphQLRouter whose resolvers read from the request's ModelLoader and whose endpoint caches results."""
+
+    def __init__(self, data_model, data_model_name, middleware, cache_size=QUERY_CACHE_SIZE):
+        super().__init__(data_model, data_model_name, middleware)
+        self.cache_size = cache_size
+        self.app = None
+
+    def generate_graphql_endpoint(self):
+        for top_level_model_type in self.data_model.get_top_level_types():
+            self.create_query_for_model(top_level_model_type)
+        schema = graphene.Schema(query=self.query)
+        self.app = CachedGraphQLApp(schema, self.middleware, self.data_model_name, self.cache_size,
+                                    on_get=make_graphiql_handler())
+        self.middleware.app.mount("/graphql", self.app)
+
+    def get_aas_resolve_function(self, model):
+        async def resolve_models(root, info):
+            models = await info.context["models"].models()
+            return [_as_type(model, value) for value in models.get(model.__name__, [])]
+
+        resolve_models.__name__ = f"resolve_{model.__name__}"
+        return resolve_models
+
+    def get_submodel_resolve_function(self, model):
+        async def resolve_models(root, info):
+            loader = info.context["models"]
+            persisted = (await loader.models()).get(model.__name__, [])
+            contained = (await loader.submodels()).get(model.__name__, [])
+            by_id = {}
+            for value in persisted + contained:
+                by_id.setdefault(value.id, value)
+            return [_as_type(model, value) for value in by_id.values()]
+
+        resolve_models.__name__ = f"resolve_{model.__name__}"
+        return resolve_models
+
+
+# ========== 查询结果缓存 ==========
+class CachedGraphQLApp(GraphQLApp):
+    """
+    GraphQLApp answering repeated queries from a result cache keyed on the
+    normalized query, variables and operation name. Any write to a model of
+    the data model clears it; a result computed across a write is not stored.
+    """
+
+    def __init__(self, schema, middleware, data_model_name, cache_size=QUERY_CACHE_SIZE, **kwargs):
+        super().__init__(schema, context_value=self._context, **kwargs)
+        # GraphQLApp.middleware is the graphql-core middleware list
+        self.middleware_instance = middleware
+        self.data_model_name = data_model_name
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        watch_persistence(middleware, self._on_write)
+
+    def _context(self, request):
+        return {"request": request, "background": BackgroundTasks(),
+                "models": ModelLoader(self.middleware_instance, self.data_model_name)}
+
+    def _on_write(self, connection_info):
+        if connection_info.data_model_name == self.data_model_name:
+            self.invalidate()
+
+    def invalidate(self):
+        self.generation += 1
+        self._results.clear()
+
+    async def _cache_key(self, request):
+        if request.headers.get("Content-Type", "").split(";")[0] != "application/json":
+            return None
+        try:
+            operation = await request.json()
+        except ValueError:
+            return None
+        if not isinstance(operation, dict) or not isinstance(operation.get("query"), str):
+            return None
+        query = normalize_query(operation["query"])
+        if query is None:
+            return None
+        return (query, json.dumps(operation.get("variables"), sort_keys=True), operation.get("operationName"))
+
+    async def _handle_http_request(self, request):
+        key = await self._cache_key(request)
+        if key is None:
+            return await super()._handle_http_request(request)
+        body = self._results.get(key)
+        if body is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return Response(body, media_type="application/json")
+
+        self.misses += 1
+        generation = self.generation
+        response = await super()._handle_http_request(request)
+        if response.status_code == 200 and generation == self.generation and not json.loads(response.body).get("errors"):
+            self._results[key] = response.body
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return response
+
+    def stats(self):
+        return {"entries": len(self._results), "hits": self.hits, "misses": self.misses}
+
+
+def generate_graphql_api(middleware, data_model_name, cache_size=QUERY_CACHE_SIZE):
+    """Drop-in for middleware.generate_graphql_api_for_data_model with batching and result caching."""
+    router = BatchedGraphQLRouter(middleware.data_models[data_model_name], data_model_name, middleware, cache_size)
+    router.generate_graphql_endpoint()
+    return router.app
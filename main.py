@@ -1,24 +1,25 @@
 import typing
-import cv2
 import aas_middleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
 from fastapi.responses import StreamingResponse
 import requests
 import uvicorn
-from picamera2 import Picamera2
 import time
+from basyx_sync import BasyxSync, BASYX_ENV_URL
+from camera_stream import FrameBroadcaster, StreamProfile, snapshot_response
+from frame_source import OpenCVSource, PiCameraSource, source_from_env
+from graphql_cache import generate_graphql_api
+from rest_cache import ResponseCache
+from telemetry import StreamStats, TelemetryWriter
 
 # ========== 配置 ==========
 PUBLISH_TO_LAN = True
 USB_CAMERA_INDEX = 0
 
-# 初始化 USB 摄像头
-cap_usb = cv2.VideoCapture(USB_CAMERA_INDEX)
-
-# 初始化 CSI 摄像头（picamera2）
-picam2 = Picamera2()
-picam2.configure(picam2.create_video_configuration(main={"size": (640, 480)}))
-picam2.start()
+# 摄像头只采集、编码一次，所有客户端共享；有订阅者时才打开设备
+# 可用环境变量替换帧源，例如 CAMERA_USB_SOURCE=synthetic:640x480@25 或 file:/path/video.mp4
+usb_stream = FrameBroadcaster(source_from_env("CAMERA_USB_SOURCE", OpenCVSource(USB_CAMERA_INDEX)), name="camera_usb")
+csi_stream = FrameBroadcaster(source_from_env("CAMERA_CSI_SOURCE", PiCameraSource(size=(640, 480))), name="camera_csi")
 
 # ====== 通用子模型结构定义 ======
 
@@ -28,6 +29,11 @@ class BasicInfo(aas_middleware.Submodel):
 
 class VideoInfo(aas_middleware.Submodel):
     url: str
+    # 由采集线程实时更新
+    frame_rate: typing.Optional[float] = None
+    resolution: typing.Optional[str] = None
+    bitrate: typing.Optional[str] = None
+    luminosity: typing.Optional[float] = None
 
 # ====== 定义 CSI 摄像头 AAS ======
 
@@ -89,41 +95,49 @@ middleware.load_data_model("camera_usb", data_model_usb, persist_instances=True)
 
 middleware.generate_rest_api_for_data_model("camera_csi")
 middleware.generate_rest_api_for_data_model("camera_usb")
-middleware.generate_graphql_api_for_data_model("camera_csi")
-middleware.generate_graphql_api_for_data_model("camera_usb")
+generate_graphql_api(middleware, "camera_csi")
+generate_graphql_api(middleware, "camera_usb")
+
+# 轮询的看板直接拿缓存的 JSON（带 ETag），写入时失效
+rest_cache = ResponseCache(middleware).install()
+# 只把变化的子模型元素推送到 BaSyx AAS 环境，写入在 DEBOUNCE 窗口内合并；仅在设置了 BASYX_ENV_URL 时启用
+basyx_sync = BasyxSync(middleware, ["camera_csi", "camera_usb"]).install() if BASYX_ENV_URL else None
+
+# ========== 实时遥测：由实际帧更新 VideoInfo 子模型 ==========
+csi_stats = StreamStats()
+csi_stream.add_observer(csi_stats.observe)
+TelemetryWriter(middleware, "camera_csi", camera_csi.id, "video", csi_stats).install()
+usb_stats = StreamStats()
+usb_stream.add_observer(usb_stats.observe)
+TelemetryWriter(middleware, "camera_usb", camera_usb.id, "video", usb_stats).install()
 
 # 使用 middleware 的 app 实例
 app: FastAPI = middleware.app
 
-# ========== 视频流处理 ==========
-def generate_csi_frames():
-    while True:
-        frame = picam2.capture_array()
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        _, buffer = cv2.imencode('.jpg', frame)
-        jpg_frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + jpg_frame + b'\r\n')
-
-def generate_usb_frames():
-    """读取 USB 摄像头的帧并转换为 MJPEG"""
-    while cap_usb.isOpened():
-        success, frame = cap_usb.read()
-        if not success:
-            break
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
 # ========== 视频流路由 ==========
 @app.get("/camera_csi/video_feed")
-def video_feed_csi():
-    return StreamingResponse(generate_csi_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed_csi(fps: typing.Optional[float] = None, width: typing.Optional[int] = None,
+                         quality: typing.Optional[int] = None, adaptive: bool = True):
+    profile = StreamProfile(fps, width, quality, adaptive)
+    return StreamingResponse(csi_stream.async_frames(profile), media_type="multipart/x-mixed-replace; boundary=frame")
 
 @app.get("/camera_usb/video_feed")
-def video_feed_usb():
-    return StreamingResponse(generate_usb_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed_usb(fps: typing.Optional[float] = None, width: typing.Optional[int] = None,
+                         quality: typing.Optional[int] = None, adaptive: bool = True):
+    profile = StreamProfile(fps, width, quality, adaptive)
+    return StreamingResponse(usb_stream.async_frames(profile), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@app.get("/camera_csi/snapshot.jpg")
+async def snapshot_csi(after: typing.Optional[int] = None, if_none_match: typing.Optional[str] = Header(None)):
+    return await snapshot_response(csi_stream, if_none_match, after)
+
+@app.get("/camera_usb/snapshot.jpg")
+async def snapshot_usb(after: typing.Optional[int] = None, if_none_match: typing.Optional[str] = Header(None)):
+    return await snapshot_response(usb_stream, if_none_match, after)
+
+@app.get("/basyx_sync/stats")
+async def basyx_sync_stats():
+    return basyx_sync.stats() if basyx_sync is not None else {"enabled": False}
 
 # ========== 启动服务 ==========
 if __name__ == "__main__":
@@ -133,6 +147,9 @@ if __name__ == "__main__":
     print(f"  - Swagger 接口文档: http://{HOST}:{PORT}/docs")
     print(f"  - CSI 视频流: http://{HOST}:{PORT}/camera_csi/video_feed")
     print(f"  - USB 视频流: http://{HOST}:{PORT}/camera_usb/video_feed")
+    print(f"  - CSI 快照: http://{HOST}:{PORT}/camera_csi/snapshot.jpg")
+    print(f"  - USB 快照: http://{HOST}:{PORT}/camera_usb/snapshot.jpg")
     print(f"  - CSI AAS 字段: http://{HOST}:{PORT}/CameraCSI")
     print(f"  - USB AAS 字段: http://{HOST}:{PORT}/CameraUSB")
+    print(f"  - BaSyx 同步状态: http://{HOST}:{PORT}/basyx_sync/stats")
     uvicorn.run(app, host=HOST, port=PORT)
\ No newline at end of file
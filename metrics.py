@@ -0,0 +1,270 @@
+import json
+import threading
+import weakref
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import simpy
+
+# --- Parameters ---
+METRICS_TOPIC = "simulation/metrics"
+METRICS_INTERVAL = 5.0       # wall-clock seconds between MQTT metric reports
+METRICS_PORT = 9108
+# Upper bounds of the queue-length histogram buckets (time spent at length <= le)
+QUEUE_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# One registry per simulation environment, looked up by the dispatchers
+_registries = weakref.WeakKeyDictionary()
+
+
+def metrics_for(env):
+    """SchedulerMetrics attached to `env`, or None if the run is not instrumented."""
+    return _registries.get(env)
+
+
+# --- Per-sensor resource accounting ---
+class ResourceMetrics:
+    """
+    Time-weighted busy and queue integrals of one resource. update() is
+    called on every state change, so each interval is accounted exactly once
+    and the cost per request/release is a handful of additions.
+    """
+
+    def __init__(self, registry, env, name, capacity):
+        self.registry = registry
+        self.env = env
+        self.name = name
+        self.capacity = capacity
+        self.since = env.now
+        self.last = env.now
+        self.users = 0
+        self.queued = 0
+        self.busy_time = 0.0
+        self.queue_time = 0.0
+        self.max_queue = 0
+        self.requests = 0
+        self.preemptions = 0
+        # queue length -> simulated seconds spent at that length
+        self.queue_hist = {}
+
+    def update(self, users, queued):
+        now = self.env.now
+        dt = now - self.last
+        if dt:
+            self.busy_time += self.users * dt
+            self.queue_time += self.queued * dt
+            self.queue_hist[self.queued] = self.queue_hist.get(self.queued, 0.0) + dt
+            self.last = now
+        self.users = users
+        self.queued = queued
+        if queued > self.max_queue:
+            self.max_queue = queued
+
+    def snapshot(self):
+        # Read-only (may run on the reporter thread): the open interval is added locally
+        now = self.env.now
+        dt = now - self.last
+        elapsed = now - self.since
+        queue_hist = dict(self.queue_hist)
+        if dt:
+            queue_hist[self.queued] = queue_hist.get(self.queued, 0.0) + dt
+        return {
+            "utilization": (self.busy_time + self.users * dt) / (self.capacity * elapsed) if elapsed else 0.0,
+            "mean_queue": (self.queue_time + self.queued * dt) / elapsed if elapsed else 0.0,
+            "max_queue": self.max_queue,
+            "queue": self.queued,
+            "busy": self.users,
+            "requests": self.requests,
+            "preemptions": self.preemptions,
+            "queue_hist": queue_hist,
+        }
+
+
+class InstrumentedResource(simpy.PreemptiveResource):
+    """PreemptiveResource that reports every grant, preemption and release to ResourceMetrics."""
+
+    def __init__(self, env, capacity=1, metrics=None):
+        super().__init__(env, capacity)
+        self.metrics = metrics
+
+    def _do_put(self, event):
+        full = len(self.users) >= self.capacity
+        result = super()._do_put(event)
+        if full and event.triggered:
+            # Granted while all slots were taken: a lower-priority user was preempted
+            self.metrics.preemptions += 1
+            self.metrics.registry.count("preemptions", self.metrics.name)
+        return result
+
+    # Every request, grant and release passes through one of these two
+    def _trigger_put(self, get_event):
+        super()._trigger_put(get_event)
+        if get_event is None:
+            # Called from Request.__init__
+            self.metrics.requests += 1
+        self.metrics.update(len(self.users), len(self.put_queue))
+
+    def _trigger_get(self, put_event):
+        super()._trigger_get(put_event)
+        self.metrics.update(len(self.users), len(self.put_queue))
+
+
+# --- Registry for one simulation ---
+class SchedulerMetrics:
+    """
+    Sensor utilization and queue histograms, per-strategy counters
+    (preemptions, CSI→USB fallbacks, dispatched tasks) and, with
+    `count_events`, the number of SimPy events scheduled per event type.
+    """
+
+    def __init__(self, env, count_events=True):
+        self.env = env
+        self.strategy = None
+        self.resources = {}
+        # (counter name, strategy, sensor) -> count
+        self.counters = Counter()
+        self.events = Counter()
+        if count_events:
+            self._count_events(env)
+        _registries[env] = self
+
+    def _count_events(self, env):
+        schedule = env.schedule
+        events = self.events
+
+        def counting_schedule(event, priority=simpy.core.NORMAL, delay=0):
+            events[event.__class__] += 1
+            schedule(event, priority, delay)
+
+        # Instance attribute shadows Environment.schedule for this env only
+        env.schedule = counting_schedule
+
+    def resource(self, name, capacity=1):
+        metrics = ResourceMetrics(self, self.env, name, capacity)
+        self.resources[name] = metrics
+        return InstrumentedResource(self.env, capacity, metrics)
+
+    def count(self, counter, sensor=None, n=1):
+        self.counters[(counter, self.strategy, sensor)] += n
+
+    def snapshot(self):
+        counters = {}
+        for (counter, strategy, sensor), value in list(self.counters.items()):
+            counters.setdefault(counter, []).append({"strategy": strategy, "sensor": sensor, "value": value})
+        return {
+            "time": self.env.now,
+            "strategy": self.strategy,
+            "sensors": {name: m.snapshot() for name, m in list(self.resources.items())},
+            "counters": counters,
+            "events": {cls.__name__: n for cls, n in list(self.events.items())},
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        snap = self.snapshot()
+        lines = [
+            "# HELP scheduler_sim_time_seconds Current simulation time.",
+            "# TYPE scheduler_sim_time_seconds gauge",
+            f"scheduler_sim_time_seconds {snap['time']}",
+        ]
+        gauges = (
+            ("utilization", "Time-weighted fraction of sensor capacity in use."),
+            ("mean_queue", "Time-weighted mean number of waiting requests."),
+            ("max_queue", "Longest queue observed."),
+            ("queue", "Requests currently waiting."),
+        )
+        for field, help_text in gauges:
+            lines.append(f"# HELP scheduler_sensor_{field} {help_text}")
+            lines.append(f"# TYPE scheduler_sensor_{field} gauge")
+            for name, s in snap["sensors"].items():
+                lines.append(f'scheduler_sensor_{field}{{sensor="{name}"}} {s[field]}')
+        lines.append("# HELP scheduler_sensor_requests_total Resource requests issued.")
+        lines.append("# TYPE scheduler_sensor_requests_total counter")
+        for name, s in snap["sensors"].items():
+            lines.append(f'scheduler_sensor_requests_total{{sensor="{name}"}} {s["requests"]}')
+
+        lines.append("# HELP scheduler_queue_length_seconds Simulated seconds spent at queue length <= le.")
+        lines.append("# TYPE scheduler_queue_length_seconds histogram")
+        for name, s in snap["sensors"].items():
+            hist = s["queue_hist"]
+            total = sum(hist.values())
+            for le in QUEUE_BUCKETS:
+                below = sum(t for length, t in hist.items() if length <= le)
+                lines.append(f'scheduler_queue_length_seconds_bucket{{sensor="{name}",le="{le}"}} {below}')
+            lines.append(f'scheduler_queue_length_seconds_bucket{{sensor="{name}",le="+Inf"}} {total}')
+            weighted = sum(length * t for length, t in hist.items())
+            lines.append(f'scheduler_queue_length_seconds_sum{{sensor="{name}"}} {weighted}')
+            lines.append(f'scheduler_queue_length_seconds_count{{sensor="{name}"}} {total}')
+
+        for counter, samples in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE scheduler_{counter}_total counter")
+            for sample in samples:
+                labels = f'strategy="{sample["strategy"]}"'
+                if sample["sensor"] is not None:
+                    labels += f',sensor="{sample["sensor"]}"'
+                lines.append(f"scheduler_{counter}_total{{{labels}}} {sample['value']}")
+
+        if snap["events"]:
+            lines.append("# HELP scheduler_simpy_events_total SimPy events scheduled, by event type.")
+            lines.append("# TYPE scheduler_simpy_events_total counter")
+            for event_type, n in sorted(snap["events"].items()):
+                lines.append(f'scheduler_simpy_events_total{{type="{event_type}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+# --- Exposure: periodic MQTT topic and Prometheus scrape endpoint ---
+class MetricsReporter:
+    """Publishes SchedulerMetrics.snapshot() as JSON every `interval` wall-clock seconds."""
+
+    def __init__(self, metrics, mqtt_client, topic=METRICS_TOPIC, interval=METRICS_INTERVAL):
+        self.metrics = metrics
+        self.mqtt_client = mqtt_client
+        self.topic = topic
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self):
+        try:
+            self.mqtt_client.publish(self.topic, json.dumps(self.metrics.snapshot()))
+        except Exception as e:
+            print(f"⚠️ Failed to publish metrics: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # Final state of the run always goes out
+        self.publish()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+
+def serve_metrics(metrics, port=METRICS_PORT, host="0.0.0.0"):
+    """Serve /metrics for Prometheus from a daemon thread; returns the server (call shutdown())."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
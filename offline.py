@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+from collections import deque
+
+from paho.mqtt.client import topic_matches_sub
+
+from task_loader import parse_task_element, map_safety_level
+from aasx import load_task_data_from_aasx, load_strategy_from_aasx, TASK_SUBMODEL, STRATEGY_SUBMODEL, STRATEGY_ELEMENT
+
+DEFAULT_STRATEGY = "fair"
+TASK_VALUE_FIELDS = ("safety", "realtime", "duration")
+RECORD_LIMIT = 1000          # publishes kept by RecordingMqttClient; older ones are only counted
+
+
+# --- In-process MQTT stand-in ---
+class _PublishInfo:
+    rc = 0
+    mid = 0
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+    def is_published(self):
+        return True
+
+
+class RecordingMqttClient:
+    """
+    Drop-in for paho's mqtt.Client that records publishes instead of sending them.
+    Only the newest `keep` messages are held (keep=None records all of them, keep=0
+    only counts); `published` counts every publish.
+    """
+
+    def __init__(self, echo=False, keep=RECORD_LIMIT):
+        self.echo = echo
+        self.messages = deque(maxlen=keep)
+        self.published = 0
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def connect(self, host=None, port=1883, keepalive=60):
+        return 0
+
+    def loop_start(self):
+        return 0
+
+    def loop_stop(self):
+        return 0
+
+    def disconnect(self):
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        return 0, 0
+
+    def unsubscribe(self, topic):
+        return 0, 0
+
+    def message_callback_add(self, sub, callback):
+        self._callbacks[sub] = callback
+
+    def message_callback_remove(self, sub):
+        self._callbacks.pop(sub, None)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        with self._lock:
+            self.messages.append((topic, payload))
+            self.published += 1
+        if self.echo:
+            print(f"📨 {topic} {payload}")
+        self.inject(topic, payload)
+        return _PublishInfo()
+
+    def inject(self, topic, payload):
+        """Deliver a message to the matching message_callback_add handlers."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        msg = _Message(topic, payload)
+        for sub, callback in list(self._callbacks.items()):
+            if topic_matches_sub(sub, topic):
+                callback(self, None, msg)
+
+
+class _Message:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+# --- In-memory strategy source (same interface as StrategyCache) ---
+class StaticStrategySource:
+    def __init__(self, strategy=DEFAULT_STRATEGY):
+        self.strategy = strategy
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def set(self, strategy):
+        self.strategy = strategy.strip().lower()
+
+    def get(self):
+        return self.strategy
+
+
+# --- In-memory task source ---
+SAFETY_LEVELS = "ABCD"
+
+
+def record_safety(value):
+    """Safety level letter for a record value: "A".."D" or the ints 1..4 map_safety_level yields."""
+    if isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= len(SAFETY_LEVELS):
+        return SAFETY_LEVELS[value - 1]
+    if isinstance(value, str) and len(value.strip()) == 1 and value.strip().upper() in SAFETY_LEVELS:
+        return value.strip().upper()
+    raise ValueError(f"unknown safety level {value!r} (expected A-D or 1-4)")
+
+
+def record_to_task(record):
+    """Normalize a flat task record (JSONL line) into the dict parse_task_element produces."""
+    safety = next((record[k] for k in ("safety_str", "safety", "Safety_level") if record.get(k) is not None), "A")
+    safety_str = record_safety(safety)
+    realtime = record.get("realtime", record.get("Timing_criticality", 1))
+    duration = record.get("duration", record.get("Duration", 1.0))
+    return {
+        "safety": map_safety_level(safety_str),
+        "safety_str": safety_str,
+        "realtime": int(realtime),
+        "duration": float(duration),
+        "description": record.get("description") or ""
+    }
+
+
+class InMemoryTaskSource:
+    """
+    Task definitions held in memory, loadable from an AAS JSON environment,
+    a JSONL file of flat task records or an .aasx package.
+    """
+
+    def __init__(self, task_data=None, strategy=DEFAULT_STRATEGY):
+        self.task_data = dict(task_data or {})
+        self.strategy = StaticStrategySource(strategy)
+
+    @classmethod
+    def from_file(cls, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".aasx":
+            return cls(load_task_data_from_aasx(path), load_strategy_from_aasx(path))
+        if ext == ".jsonl":
+            return cls.from_jsonl(path)
+        if ext == ".json":
+            return cls.from_aas_json(path)
+        raise ValueError(f"Unsupported offline source '{path}'")
+
+    @classmethod
+    def from_jsonl(cls, path):
+        task_data = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                task_id = record.get("id") or record.get("task_id")
+                task_data[task_id] = record_to_task(record)
+        return cls(task_data)
+
+    @classmethod
+    def from_aas_json(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        environment = json.loads(content) if content.strip() else {}
+        task_data = {}
+        strategy = DEFAULT_STRATEGY
+        for submodel in environment.get("submodels", []):
+            for element in submodel.get("submodelElements", []):
+                if submodel.get("idShort") == TASK_SUBMODEL and element.get("modelType") == "SubmodelElementCollection":
+                    task_data[element["idShort"]] = parse_task_element(element)
+                elif submodel.get("idShort") == STRATEGY_SUBMODEL and element.get("idShort") == STRATEGY_ELEMENT:
+                    strategy = (element.get("value") or DEFAULT_STRATEGY).strip().lower()
+        return cls(task_data, strategy)
+
+    def add_task(self, task_id, values):
+        self.task_data[task_id] = values
+
+    # Same contract as task_loader.load_tasks, except that every task must be in the source
+    def load_tasks(self, tasks):
+        missing = [task["id"] for task in tasks if task["id"] not in self.task_data]
+        if missing:
+            raise ValueError(f"Offline source has no data for task(s) {', '.join(missing)} "
+                             f"(it defines {', '.join(sorted(map(str, self.task_data))) or 'none'})")
+        # e.g. an AAS whose properties are not named Duration/Safety_level/Timing_criticality
+        incomplete = []
+        for task in tasks:
+            unset = [field for field in TASK_VALUE_FIELDS if self.task_data[task["id"]].get(field) is None]
+            if unset:
+                incomplete.append(f"{task['id']} ({', '.join(unset)})")
+        if incomplete:
+            raise ValueError(f"Offline source has no value for {'; '.join(incomplete)}")
+        for task in tasks:
+            task.update(self.task_data[task["id"]])
+            print(f"✔️ Task loaded: {task}")
+        return tasks
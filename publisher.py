@@ -0,0 +1,243 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from json.encoder import encode_basestring_ascii as _encode_str
+
+# --- Parameters ---
+BATCH_SIZE = 1
+BATCH_INTERVAL = 0.05
+MAX_QUEUE = 10000
+QOS = 0
+POLICIES = ("block", "drop-oldest", "spill")
+# Where the "spill" policy writes overflow results (result_spill_<pid>.jsonl)
+SPILL_DIR = os.environ.get("RESULT_SPILL_DIR", tempfile.gettempdir())
+SPILL_RETRY_INTERVAL = 5.0   # seconds before a failed replay of spilled results is tried again
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4         # paho.mqtt.client.MQTT_ERR_NO_CONN; paho keeps QoS>0 messages for the reconnect
+
+
+# --- Result serializer (fixed schema, no dict round trip) ---
+def _encode_num(value):
+    return "null" if value is None else repr(value)
+
+
+def _encode_any(value):
+    if isinstance(value, str):
+        return _encode_str(value)
+    return _encode_num(value)
+
+
+def serialize_result(task_id, sensor, finish_time, description, safety, realtime, duration):
+    return (
+        '{"task_id": ' + _encode_str(task_id)
+        + ', "sensor": ' + _encode_str(sensor)
+        + ', "finish_time": ' + _encode_num(finish_time)
+        + ', "description": ' + _encode_str(description or "")
+        + ', "safety": ' + _encode_any(safety)
+        + ', "realtime": ' + _encode_any(realtime)
+        + ', "duration": ' + _encode_any(duration)
+        + '}'
+    )
+
+
+# --- Used by the dispatchers ---
+def publish_result(mqtt_client, MQTT_TOPIC, task, sensor_name, finish_time):
+    result = (task["id"], sensor_name, finish_time, task["description"],
+              task["safety_str"], task["realtime"], task["duration"])
+    if isinstance(mqtt_client, ResultPublisher):
+        mqtt_client.submit(result)
+    else:
+        mqtt_client.publish(MQTT_TOPIC, serialize_result(*result))
+
+
+# --- Batched asynchronous publisher ---
+class ResultPublisher:
+    """
+    Bounded queue of finished-task results drained by a background thread.
+    Up to `batch_size` results (or whatever arrived within `batch_interval`
+    seconds) go out as one message; batch_size=1 keeps one JSON object per
+    message, larger batches are sent as a JSON array.
+
+    A result counts as sent once the client accepted it (publish rc 0);
+    QoS>0 results published while disconnected are counted as deferred
+    (paho sends them after reconnecting), anything else as failed. After
+    close() new results are not queued but counted as rejected.
+    """
+
+    def __init__(self, mqtt_client, topic, batch_size=BATCH_SIZE, batch_interval=BATCH_INTERVAL,
+                 max_queue=MAX_QUEUE, policy="block", spill_file=None, qos=QOS, spill_dir=SPILL_DIR):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {POLICIES}")
+        self.mqtt_client = mqtt_client
+        self.topic = topic
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.max_queue = max_queue
+        self.policy = policy
+        self.spill_file = spill_file or os.path.join(spill_dir, f"result_spill_{os.getpid()}.jsonl")
+        self.qos = qos
+
+        self.queued = 0
+        self.sent = 0
+        self.deferred = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.rejected = 0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._spill_pending = 0
+        self._spill_failed = 0       # spilled results whose last replay failed (counted in `failed`)
+        self._replay_after = 0.0
+        self._closed = False
+        self._thread = None
+
+    # MQTT client interface, so a ResultPublisher can stand in for the client
+    def publish(self, topic, payload, qos=None):
+        return self.mqtt_client.publish(topic, payload, qos=self.qos if qos is None else qos)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="result-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, result):
+        """Queue (or spill) one result; False if it was rejected because the publisher is closed."""
+        with self._cond:
+            if not self._closed and len(self._queue) >= self.max_queue:
+                if self.policy == "block":
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        self._cond.wait()
+                elif self.policy == "drop-oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    with open(self.spill_file, "a", encoding="utf-8") as f:
+                        f.write(serialize_result(*result) + "\n")
+                    self._spill_pending += 1
+                    self.spilled += 1
+                    return True
+            if self._closed:
+                # The drain thread is gone or finishing; queueing would lose the result silently
+                self.rejected += 1
+                return False
+            self._queue.append(result)
+            self.queued += 1
+            self._cond.notify_all()
+            return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": self.queued,
+                "sent": self.sent,
+                "deferred": self.deferred,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "rejected": self.rejected,
+                "pending": len(self._queue) + self._spill_pending,
+            }
+
+    def close(self, timeout=None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed and not self._replay_due():
+                self._cond.wait(self._replay_after - time.monotonic() if self._spill_pending else None)
+            if not self._queue:
+                return None
+            deadline = time.monotonic() + self.batch_interval
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._cond.notify_all()
+            return batch
+
+    def _send(self, payloads):
+        if len(payloads) == 1 and self.batch_size == 1:
+            info = self.publish(self.topic, payloads[0])
+        else:
+            info = self.publish(self.topic, "[" + ", ".join(payloads) + "]")
+        rc = getattr(info, "rc", MQTT_ERR_SUCCESS)
+        with self._cond:
+            if rc == MQTT_ERR_SUCCESS:
+                self.sent += len(payloads)
+            elif rc == MQTT_ERR_NO_CONN and self.qos > 0:
+                self.deferred += len(payloads)
+            else:
+                self.failed += len(payloads)
+        if rc != MQTT_ERR_SUCCESS:
+            print(f"⚠️ Publishing {len(payloads)} result(s) returned rc {rc}")
+
+    def _replay_due(self):
+        return self._spill_pending and time.monotonic() >= self._replay_after
+
+    def _replay_spill(self):
+        """Send the spilled results; False if a send failed and the rest stays on disk for a later pass."""
+        with self._cond:
+            if not self._spill_pending or not (self._closed or self._replay_due()):
+                return not self._spill_pending
+            replay_file = self.spill_file + ".replay"
+            os.replace(self.spill_file, replay_file)
+            self._spill_pending = 0
+        with open(replay_file, "r", encoding="utf-8") as f:
+            lines = [line.rstrip("\n") for line in f if line.strip()]
+        for i in range(0, len(lines), self.batch_size):
+            try:
+                self._send(lines[i:i + self.batch_size])
+            except Exception as e:
+                print(f"❌ Failed to replay {len(lines) - i} spilled result(s), retrying later: {e}")
+                self._respill(lines[i:])
+                os.remove(replay_file)
+                return False
+        os.remove(replay_file)
+        with self._cond:
+            self.failed -= self._spill_failed
+            self._spill_failed = 0
+        return True
+
+    def _respill(self, lines):
+        # Unsent lines go back in front of whatever was spilled meanwhile
+        with self._cond:
+            spilled_since = []
+            if os.path.exists(self.spill_file):
+                with open(self.spill_file, "r", encoding="utf-8") as f:
+                    spilled_since = [line.rstrip("\n") for line in f if line.strip()]
+            with open(self.spill_file, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines + spilled_since)
+            self._spill_pending = len(lines) + len(spilled_since)
+            self.failed += len(lines) - self._spill_failed
+            self._spill_failed = len(lines)
+            self._replay_after = time.monotonic() + SPILL_RETRY_INTERVAL
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                # Queue drained: results that were spilled to disk go out now
+                replayed = self._replay_spill()
+                with self._cond:
+                    if self._closed and not self._queue:
+                        if not replayed:
+                            print(f"⚠️ {self._spill_pending} result(s) left unsent in {self.spill_file}")
+                        return
+                continue
+            try:
+                self._send([serialize_result(*result) for result in batch])
+            except Exception as e:
+                print(f"❌ Failed to publish {len(batch)} result(s): {e}")
+                with self._cond:
+                    self.failed += len(batch)
@@ -0,0 +1,206 @@
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import simpy.rt
+
+from compute import DEADLINES
+from sensors import get_sensor_specs
+from task_loader import get_session
+from task_log import StreamingStats
+
+# --- Parameters ---
+# Real sensor work per task: grab this many frames per second of nominal duration
+FRAMES_PER_SECOND = 10
+POLL_INTERVAL = 0.01         # how often a SimPy process checks its running work
+GRAB_TIMEOUT = 10.0          # seconds to wait for a frame before the work fails
+CHUNK_SIZE = 16 * 1024
+JPEG_EOI = b"\xff\xd9"
+
+# One runner per real-time environment; None means simulated durations
+_runners = weakref.WeakKeyDictionary()
+
+
+def runner_for(env):
+    return _runners.get(env)
+
+
+def realtime_lag(env):
+    """Seconds the wall clock is ahead of where env.now should be (positive = running late)."""
+    return time.monotonic() - (env.real_start + (env.now - env.env_start) * env.factor)
+
+
+# --- Sensor work used by all dispatchers ---
+def perform(env, task, sensor, duration):
+    """
+    The work of `task` on `sensor`, as a generator to `yield from`. Simulated
+    environments just wait `duration`; with a RealtimeRunner attached the
+    frames are really grabbed and the measured time is what elapses.
+    """
+    runner = _runners.get(env)
+    if runner is None:
+        yield env.timeout(duration)
+    else:
+        yield from runner.run(task, sensor, duration)
+
+
+# --- Frame grabbers ---
+# A grab is grab(n, cancel): read n frames, stopping early once the
+# threading.Event `cancel` is set (the task was preempted); returns frames read.
+def grab_http_frames(url, n, cancel=None, timeout=GRAB_TIMEOUT):
+    """Read `n` JPEG frames from an MJPEG (multipart/x-mixed-replace) stream."""
+    count = 0
+    tail = b""
+    with get_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if cancel is not None and cancel.is_set():
+                return count
+            data = tail + chunk
+            count += data.count(JPEG_EOI)
+            if count >= n:
+                return n
+            tail = data[-1:]
+    raise IOError(f"MJPEG stream {url} ended after {count}/{n} frames")
+
+
+class SourceGrabber:
+    """Grabs frames straight from a frame_source.FrameSource (local camera, file, synthetic)."""
+
+    def __init__(self, source):
+        self.source = source
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def __call__(self, n, cancel=None):
+        with self._lock:
+            if not self._opened:
+                self.source.open()
+                self._opened = True
+            for i in range(n):
+                if cancel is not None and cancel.is_set():
+                    return i
+                if self.source.read() is None:
+                    raise IOError(f"{self.source.name} ended after {i}/{n} frames")
+        return n
+
+    def close(self):
+        with self._lock:
+            if self._opened:
+                self.source.close()
+                self._opened = False
+
+
+def make_grabber(sensor, source_spec=None):
+    """Callable grab(n) for a sensor: `source_spec` if given, else its HTTP endpoint, else its endpoint as a source spec."""
+    from frame_source import make_source  # cv2 is only needed for local sources
+
+    if source_spec:
+        return SourceGrabber(make_source(source_spec))
+    endpoint = getattr(sensor, "endpoint", None)
+    if endpoint and endpoint.startswith(("http://", "https://")):
+        return lambda n, cancel=None: grab_http_frames(endpoint, n, cancel)
+    if endpoint:
+        return SourceGrabber(make_source(endpoint))
+    raise ValueError(f"Sensor {sensor.name} has no endpoint to grab frames from")
+
+
+# --- Real-time execution ---
+class RealtimeRunner:
+    """
+    Drives a simpy.rt.RealtimeEnvironment with real sensor work. Work runs
+    on a thread pool (one worker per sensor slot) while the SimPy process
+    polls for it, so the environment keeps pacing other events. Records
+    timing drift, dispatch overhead, waits, measured durations and
+    deadline misses.
+    """
+
+    def __init__(self, env, frames_per_second=FRAMES_PER_SECOND, source_spec=None, max_workers=None,
+                 poll_interval=POLL_INTERVAL):
+        if not isinstance(env, simpy.rt.RealtimeEnvironment):
+            raise TypeError("RealtimeRunner needs a simpy.rt.RealtimeEnvironment")
+        self.env = env
+        self.frames_per_second = frames_per_second
+        self.source_spec = source_spec
+        self.poll_interval = poll_interval
+        if max_workers is None:
+            # At most one task runs per sensor slot, so more workers would only sit idle
+            max_workers = max(1, sum(spec.capacity for spec in get_sensor_specs()))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sensor-work")
+        self._grabbers = {}
+        self._arrivals = {}          # id(task) -> dispatch time; one task dict per arrival, popped at its first run
+        self.drift = StreamingStats()
+        self.dispatch_overhead = StreamingStats()
+        self.wait = StreamingStats()
+        self.duration = StreamingStats()
+        self.duration_error = StreamingStats()
+        self.deadline_misses = 0
+        self.failures = 0
+        _runners[env] = self
+
+    def lag(self):
+        return realtime_lag(self.env)
+
+    def record_dispatch(self, task, seconds):
+        """Note the arrival of `task`, which must be a dict of its own (repeated ids are distinct arrivals)."""
+        self._arrivals[id(task)] = time.monotonic()
+        self.dispatch_overhead.add(seconds)
+        self.drift.add(self.lag())
+
+    def _grabber(self, sensor):
+        grabber = self._grabbers.get(sensor.name)
+        if grabber is None:
+            grabber = self._grabbers[sensor.name] = make_grabber(sensor, self.source_spec)
+        return grabber
+
+    def frames_for(self, task, duration):
+        """Frames for `duration` seconds of the task's work (a remaining or penalized run scales task["frames"])."""
+        if task.get("frames") and task.get("duration"):
+            return max(1, round(task["frames"] * duration / task["duration"]))
+        return task.get("frames") or max(1, round(duration * self.frames_per_second))
+
+    def run(self, task, sensor, duration):
+        started = time.monotonic()
+        arrival = self._arrivals.pop(id(task), None)
+        if arrival is not None:
+            wait = started - arrival
+            self.wait.add(wait)
+            if wait > DEADLINES.get(task.get("realtime"), float("inf")):
+                self.deadline_misses += 1
+        cancel = threading.Event()
+        future = self.executor.submit(self._grabber(sensor), self.frames_for(task, duration), cancel)
+        try:
+            while not future.done():
+                yield self.env.timeout(self.poll_interval)
+        except simpy.Interrupt:
+            # Preempted: stop grabbing so the sensor is free for the preempting task
+            cancel.set()
+            raise
+        measured = time.monotonic() - started
+        try:
+            future.result()
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ {task['id']}: sensor work on {sensor.name} failed: {e}")
+        self.duration.add(measured)
+        if duration:
+            self.duration_error.add(measured - duration)
+
+    def stats(self):
+        return {
+            "drift": self.drift.summary(),
+            "dispatch_overhead": self.dispatch_overhead.summary(),
+            "wait": self.wait.summary(),
+            "duration": self.duration.summary(),
+            "duration_error": self.duration_error.summary(),
+            "deadline_misses": self.deadline_misses,
+            "failures": self.failures,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self._arrivals.clear()
+        for grabber in self._grabbers.values():
+            if isinstance(grabber, SourceGrabber):
+                grabber.close()
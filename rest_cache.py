@@ -0,0 +1,201 @@
+import hashlib
+from collections import OrderedDict
+
+from starlette.middleware import Middleware
+
+# ========== 配置 ==========
+RESPONSE_CACHE_SIZE = 1024   # cached GET responses kept, oldest evicted first
+WRITE_METHODS = ("PUT", "POST", "PATCH", "DELETE")
+CACHE_CONTROL = "no-cache"   # clients may keep the body but must revalidate with If-None-Match
+
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+# ========== 持久化写入通知 ==========
+def watch_persistence(middleware, on_write):
+    """
+    Call on_write(connection_info) after every consume() of a persistence
+    connector of `middleware`, including connectors persisted later on.
+    """
+    registry = middleware.persistence_registry
+    add_connection = registry.add_connection
+
+    def watch(connection_info):
+        connector = registry.get_connection(connection_info)
+        consume = connector.consume
+
+        async def consume_and_notify(body):
+            try:
+                await consume(body)
+            finally:
+                on_write(connection_info)
+
+        connector.consume = consume_and_notify
+
+    def add_watched_connection(connection_info, connector, type_connection_info):
+        add_connection(connection_info, connector, type_connection_info)
+        watch(connection_info)
+
+    registry.add_connection = add_watched_connection
+    for connection_info in list(registry.connections):
+        watch(connection_info)
+
+
+# ========== 序列化结果缓存 ==========
+class ResponseCache:
+    """
+    Keeps the serialized JSON of the middleware's generated REST GET
+    endpoints (/{AAS type}/, /{AAS type}/{id}, /{AAS type}/{id}/{submodel}/)
+    with a strong ETag, so polling clients get the stored bytes or a 304
+    instead of a model fetch + validate + dump per request.
+
+    Entries of an AAS (its own and its submodels') are dropped on any
+    PUT/POST/PATCH/DELETE below /{AAS type}/{id}, and on any write through
+    its persistence connector (telemetry, workflows, middleware.update_value).
+    """
+
+    def __init__(self, middleware, max_entries=RESPONSE_CACHE_SIZE):
+        self.middleware = middleware
+        self.max_entries = max_entries
+        self.prefixes = set()
+        self._entries = OrderedDict()   # (path, query) -> (model id, body, etag, headers)
+        self._by_model = {}             # model id -> cached keys; None for the /{AAS type}/ lists
+        # Bumped on every invalidation; a response rendered across one is not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def install(self):
+        """Cache the REST APIs generated so far and watch the persistence for writes."""
+        for data_model in self.middleware.data_models.values():
+            self.prefixes.update(model_type.__name__ for model_type in data_model.get_top_level_types())
+        # Innermost user middleware: CORS and other headers are still added per request
+        self.middleware.app.user_middleware.append(Middleware(CachedResponses, cache=self))
+        watch_persistence(self.middleware, lambda connection_info: self.invalidate(connection_info.model_id))
+        return self
+
+    # ---------- 键与失效 ----------
+    def model_of(self, path):
+        """(is cached path, model id) for a request path; model id None for the type's list."""
+        parts = path.strip("/").split("/")
+        if parts[0] not in self.prefixes:
+            return False, None
+        return True, (parts[1] if len(parts) > 1 and parts[1] else None)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key, model_id, body, headers, generation):
+        if generation != self.generation:
+            return None  # a write happened while this response was rendered
+        entry = (model_id, body, etag_for(body), headers)
+        self._entries[key] = entry
+        self._by_model.setdefault(model_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, (old_model, *_) = self._entries.popitem(last=False)
+            self._by_model.get(old_model, set()).discard(old_key)
+        return entry
+
+    def invalidate(self, model_id=None):
+        """Drop the entries of one AAS and the type lists that contain it."""
+        self.generation += 1
+        for owner in {model_id, None}:
+            for key in self._by_model.pop(owner, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._by_model.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "not_modified": self.not_modified}
+
+
+# ========== ASGI 中间件 ==========
+class CachedResponses:
+    def __init__(self, app, cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        cached, model_id = self.cache.model_of(scope["path"])
+        if not cached:
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        if method in WRITE_METHODS:
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.cache.invalidate(model_id)
+        if method != "GET":
+            return await self.app(scope, receive, send)
+
+        key = (scope["path"], scope["query_string"])
+        if_none_match = _header(scope, b"if-none-match")
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.hits += 1
+            return await self._respond(send, entry, if_none_match)
+
+        self.cache.misses += 1
+        generation = self.cache.generation
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        if start.get("status") == 200 and _is_json(start.get("headers", [])):
+            headers = [(name, value) for name, value in start["headers"]
+                       if name.lower() not in (b"content-length", b"etag", b"cache-control")]
+            entry = self.cache.store(key, model_id, body, headers, generation)
+            if entry is not None:
+                return await self._respond(send, entry, if_none_match)
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+    async def _respond(self, send, entry, if_none_match):
+        _, body, etag, headers = entry
+        validators = [(b"etag", etag.encode()), (b"cache-control", CACHE_CONTROL.encode())]
+        if etag_matches(if_none_match, etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": headers + validators + [(b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _is_json(headers):
+    return any(name.lower() == b"content-type" and value.startswith(b"application/json") for name, value in headers)
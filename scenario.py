@@ -0,0 +1,150 @@
+import contextlib
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ASIL
+from arrivals import ARRIVAL_RATE, ASIL_MIX, DURATION_MEAN, DURATION_SIGMA, synthetic_arrivals
+from compute import precompute_priorities, DEADLINES
+from energy import energy_used
+from offline import RecordingMqttClient, StaticStrategySource
+from scheduling_agent import run_simulation
+from task_log import task_finish_log, TASK_LOG_CAPACITY
+
+# --- Parameters ---
+STRATEGIES = ("mixed-critical", "fair", "energy-aware")
+RESULT_COLUMNS = ("seed", "strategy", "tasks", "finished", "makespan",
+                  "mean_wait", "p99_wait", "mean_response", "deadline_misses", "energy")
+
+
+# --- Randomized arrival plans ---
+def generate_arrival_plan(seed, n_tasks, rate=ARRIVAL_RATE, asil_mix=ASIL_MIX,
+                          duration_mean=DURATION_MEAN, duration_sigma=DURATION_SIGMA):
+    """Task table and [(time, task_id), ...] plan of n_tasks seeded arrivals.synthetic_arrivals."""
+    tasks = []
+    arrival_plan = []
+    for arrival_time, task in synthetic_arrivals(seed=seed, rate=rate, n_tasks=n_tasks, asil_mix=asil_mix,
+                                                 duration_mean=duration_mean, duration_sigma=duration_sigma):
+        tasks.append(task)
+        arrival_plan.append((arrival_time, task["id"]))
+    return tasks, arrival_plan
+
+
+# --- One scenario under one strategy, in its own simpy.Environment ---
+def run_scenario(seed, strategy, n_tasks, rate=ARRIVAL_RATE, preemption=None, penalty=None):
+    tasks, arrival_plan = generate_arrival_plan(seed, n_tasks, rate)
+    precompute_priorities(tasks)
+    if preemption is not None:
+        ASIL.set_preemption_mode(preemption, penalty)
+    mqtt_client = RecordingMqttClient(keep=None)     # every result is read back below
+    task_finish_log.clear(max(n_tasks, TASK_LOG_CAPACITY))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = run_simulation(tasks, arrival_plan, StaticStrategySource(strategy), mqtt_client, sim_time=None)
+    # Only the energy-aware dispatcher models sensor power; other strategies leave it empty
+    energy = energy_used(env)
+
+    by_id = {task["id"]: task for task in tasks}
+    arrival = dict((task_id, t) for t, task_id in arrival_plan)
+    # Wait is arrival to first start; preempted work and penalties only count towards response
+    first_start = {entry["task_id"]: entry["first_start_time"] for entry in task_finish_log}
+    waits, responses = [], []
+    misses = 0
+    makespan = 0.0
+    for _, payload in mqtt_client.messages:
+        result = json.loads(payload)
+        task = by_id[result["task_id"]]
+        response = result["finish_time"] - arrival[task["id"]]
+        wait = first_start[task["id"]] - arrival[task["id"]]
+        responses.append(response)
+        waits.append(wait)
+        makespan = max(makespan, result["finish_time"])
+        if wait > DEADLINES.get(task["realtime"], float("inf")):
+            misses += 1
+
+    finished = len(waits)
+    misses += n_tasks - finished
+    waits = np.asarray(waits) if waits else np.zeros(1)
+    return {
+        "seed": seed,
+        "strategy": strategy,
+        "tasks": n_tasks,
+        "finished": finished,
+        "makespan": round(makespan, 4),
+        "mean_wait": round(float(waits.mean()), 4),
+        "p99_wait": round(float(np.percentile(waits, 99)), 4),
+        "mean_response": round(float(np.mean(responses)) if responses else 0.0, 4),
+        "deadline_misses": misses,
+        "energy": None if energy is None else round(energy, 4)
+    }
+
+
+def _run_scenario(args):
+    return run_scenario(*args)
+
+
+# --- Monte Carlo across strategies ---
+def run_monte_carlo(n_scenarios, n_tasks, rate=ARRIVAL_RATE, base_seed=0, strategies=STRATEGIES, max_workers=None,
+                    preemption=None, penalty=None):
+    jobs = [(base_seed + i, strategy, n_tasks, rate, preemption, penalty)
+            for i in range(n_scenarios) for strategy in strategies]
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        return list(pool.map(_run_scenario, jobs, chunksize=max(1, len(jobs) // (4 * (os.cpu_count() or 1)))))
+
+
+def summarize(rows):
+    summary = {}
+    for strategy in dict.fromkeys(row["strategy"] for row in rows):
+        subset = [row for row in rows if row["strategy"] == strategy]
+        summary[strategy] = {
+            "runs": len(subset),
+            "makespan": float(np.mean([r["makespan"] for r in subset])),
+            "mean_wait": float(np.mean([r["mean_wait"] for r in subset])),
+            "p99_wait": float(np.mean([r["p99_wait"] for r in subset])),
+            "deadline_misses": float(np.mean([r["deadline_misses"] for r in subset])),
+        }
+        energy = [r["energy"] for r in subset if r["energy"] is not None]
+        if energy:
+            summary[strategy]["energy"] = float(np.mean(energy))
+    return summary
+
+
+def write_results(rows, path):
+    if path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows, columns=RESULT_COLUMNS).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monte Carlo comparison of scheduling strategies")
+    parser.add_argument("--scenarios", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=ARRIVAL_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--preemption", choices=ASIL.PREEMPTION_MODES, default=None,
+                        help="restart or resume preempted mixed-critical tasks (default: ASIL.PREEMPTION_MODE)")
+    parser.add_argument("--penalty", type=float, default=None, help="context-switch cost per preemption, seconds")
+    parser.add_argument("--out", default="scenario_results.csv", help=".csv or .parquet (needs pandas/pyarrow)")
+    args = parser.parse_args()
+
+    rows = run_monte_carlo(args.scenarios, args.tasks, args.rate, args.seed, max_workers=args.workers,
+                           preemption=args.preemption, penalty=args.penalty)
+    write_results(rows, args.out)
+    for strategy, stats in summarize(rows).items():
+        print(f"📊 {strategy:15s} runs={stats['runs']} makespan={stats['makespan']:.2f} "
+              f"mean_wait={stats['mean_wait']:.2f} p99_wait={stats['p99_wait']:.2f} "
+              f"deadline_misses={stats['deadline_misses']:.1f}"
+              + (f" energy={stats['energy']:.1f}J" if "energy" in stats else ""))
+    print(f"💾 Results written to {args.out}")
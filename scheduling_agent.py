@@ -1,10 +1,19 @@
+import time
 import simpy
-import requests
-import json
+import simpy.rt
 import paho.mqtt.client as mqtt
-from ASIL import execute_task
+from task_loader import load_tasks
+from ASIL import dispatch_mixed_critical_task
 from Fair import dispatch_fair_task
-from energy import dispatch_energy_aware_task
+from energy import dispatch_energy_aware_task, energy_used
+from strategy import StrategyCache
+from publisher import ResultPublisher
+from offline import InMemoryTaskSource, RecordingMqttClient
+from compute import precompute_priorities
+from arrivals import arrival_process, plan_arrivals, read_arrivals, synthetic_arrivals
+from realtime import RealtimeRunner, runner_for
+from sensors import SensorPool, get_sensor_specs, set_sensor_specs, fetch_sensor_specs_from_registry, load_sensor_specs
+from metrics import SchedulerMetrics, MetricsReporter, metrics_for, serve_metrics, METRICS_TOPIC, METRICS_INTERVAL, METRICS_PORT
 
 
 # --- Parameters ---
@@ -13,6 +22,12 @@ SIM_TIME = 50
 MQTT_BROKER = "192.168.31.34"
 MQTT_PORT = 1883
 MQTT_TOPIC = "simulation/task/finished"
+# Result publishing: batch size 1 keeps one JSON object per message, larger
+# batches are sent as a JSON array. Policy: "block", "drop-oldest" or "spill".
+RESULT_BATCH_SIZE = 1
+RESULT_BATCH_INTERVAL = 0.05
+RESULT_QUEUE_SIZE = 10000
+RESULT_POLICY = "block"
 BASE_SUBMODEL_URL = "http://localhost:8081/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vOTAyM18yMjEwXzUwNTJfOTY0Mg/submodel-elements"
 # mosquitto_sub -h 192.168.31.34 -t "simulation/task/finished" -v
 # --- Scheduling Strategy Summary ---
@@ -33,86 +48,18 @@ BASE_SUBMODEL_URL = "http://localhost:8081/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9
 #    - The strategy attempts to minimize sensor switching to reduce energy cost.
 #    - Each task is assigned to the sensor with the lowest load.
 #    - No preemption is allowed (except ASIL-D handled separately).
-# --- Strategy fetcher ---
-def fetch_strategy_from_basyx():
-    strategy_url = "http://localhost:8081/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vMTIzMF8zMjEwXzUwNTJfODI5Nw/submodel-elements/simpy"
-    try:
-        response = requests.get(strategy_url)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("value", "fair").strip().lower()
-    except Exception as e:
-        print(f"❌ Failed to fetch scheduling strategy: {e}")
-        return "fair"
+# --- Strategy -> dispatcher ---
+DISPATCHERS = {
+    "mixed-critical": dispatch_mixed_critical_task,
+    "fair": dispatch_fair_task,
+    "energy-aware": dispatch_energy_aware_task,
+}
 
 # --- Task list ---
-tasks = [{"id": f"Task{i}"} for i in range(1, 6)]
-
-# --- Utility: Map safety levels A-D to 1-4 ---
-def map_safety_level(level_str):
-    mapping = {"A": 1, "B": 2, "C": 3, "D": 4}
-    return mapping.get(level_str.upper(), 1)
-
-# --- Fetch task data ---
-def fetch_task_data_from_basyx(task_id):
-    url = f"{BASE_SUBMODEL_URL}/{task_id}"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
-
-    description = ""
-    for d in data.get("description", []):
-        if d.get("language") == "en":
-            description = d.get("text")
-
-    duration = safety = realtime = None
-    safety_str = "A"
-
-    for prop in data.get("value", []):
-        if prop.get("idShort") == "Duration":
-            duration = float(prop["value"])
-        elif prop.get("idShort") == "Safety_level":
-            safety_str = prop["value"]
-            safety = map_safety_level(safety_str)
-        elif prop.get("idShort") == "Timing_criticality":
-            realtime = int(prop["value"])
-
-    return {
-        "safety": safety,
-        "safety_str": safety_str,
-        "realtime": realtime,
-        "duration": duration,
-        "description": description
-    }
-
-
-# --- MQTT setup ---
-mqtt_client = mqtt.Client()
-mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-mqtt_client.loop_start()
-
-# --- Sensor class ---
-class Sensor:
-    def __init__(self, env, name):
-        self.env = env
-        self.name = name
-        self.resource = simpy.PreemptiveResource(env, capacity=1)
-
-# --- Main Simulation ---
-env = simpy.Environment()
-sensors = [Sensor(env, "CSI"), Sensor(env, "USB")]
-
-# Load task details
-for task in tasks:
-    try:
-        values = fetch_task_data_from_basyx(task["id"])
-        task.update(values)
-        print(f"✔️ Task loaded: {task}")
-    except Exception as e:
-        print(f"❌ Failed to load task {task['id']}: {e}")
+TASK_IDS = [f"Task{i}" for i in range(1, 6)]
 
 # Task arrival plan
-arrival_plan = [
+ARRIVAL_PLAN = [
     (0.0, "Task1"),
     (0.5, "Task2"),
     (1.5, "Task3"),
@@ -120,26 +67,167 @@ arrival_plan = [
     (3.0, "Task5"),
 ]
 
-# Run simulation based on dynamic scheduling strategy
-for arrival_time, task_id in arrival_plan:
-    t = next(task for task in tasks if task["id"] == task_id)
-
-    if arrival_time > env.now:
-        env.run(until=arrival_time)
-
-    current_strategy = fetch_strategy_from_basyx()
-    print(f"🔀 Strategy at {env.now:.2f}: {current_strategy}")
-
-    if current_strategy == "mixed-critical":
-        env.process(execute_task(mqtt_client, MQTT_TOPIC, env, t, sensors))
-    elif current_strategy == "fair":
-        dispatch_fair_task(mqtt_client,MQTT_TOPIC,env, t, sensors)
-    elif current_strategy == "energy-aware":
-        dispatch_energy_aware_task(mqtt_client,MQTT_TOPIC,env, t, sensors)
+# --- Main Simulation ---
+def run_simulation(tasks, arrival_plan, strategy_source, mqtt_client, sim_time=SIM_TIME, env=None, sensor_specs=None):
+    """
+    Run one simulation. `arrival_plan` is either [(time, task_id), ...]
+    referring to `tasks`, or a stream of (time, task) pairs such as
+    arrivals.read_arrivals() / synthetic_arrivals(); it is consumed lazily by
+    one arrival process and the environment is run once. `strategy_source`
+    needs get() (StrategyCache or offline.StaticStrategySource),
+    `mqtt_client` needs publish() (paho client, ResultPublisher or
+    offline.RecordingMqttClient). Metrics are recorded into
+    metrics_for(env), created here unless the caller attached one.
+    Sensors come from `sensor_specs` (default: sensors.get_sensor_specs()).
+    """
+    env = env or simpy.Environment()
+    metrics = metrics_for(env) or SchedulerMetrics(env)
+    sensors = SensorPool.build(env, sensor_specs or get_sensor_specs(), metrics)
+
+    if isinstance(arrival_plan, list) and (not arrival_plan or isinstance(arrival_plan[0][1], str)):
+        arrival_plan = plan_arrivals(arrival_plan, {task["id"]: task for task in tasks})
+
+    dispatch_at = make_dispatcher(env, sensors, strategy_source, mqtt_client, metrics)
+    env.process(arrival_process(env, arrival_plan, dispatch_at))
+    env.run(until=sim_time)
+    return env
+
+
+def make_dispatcher(env, sensors, strategy_source, mqtt_client, metrics):
+    """dispatch_at(task): hand a task to the dispatcher of the current strategy (see DISPATCHERS)."""
+    runner = runner_for(env)
+    state = {"strategy": None, "dispatch": None}
+
+    def dispatch_at(t):
+        strategy = strategy_source.get()
+        if strategy != state["strategy"]:
+            state["strategy"] = metrics.strategy = strategy
+            print(f"🔀 Strategy at {env.now:.2f}: {strategy}")
+            state["dispatch"] = DISPATCHERS.get(strategy)
+            if state["dispatch"] is None:
+                print(f"⚠️ Unknown strategy '{strategy}', defaulting to fair.")
+                state["dispatch"] = dispatch_fair_task
+        dispatch = state["dispatch"]
+
+        if runner is None:
+            dispatch(mqtt_client, MQTT_TOPIC, env, t, sensors)
+        else:
+            began = time.perf_counter()
+            t = dict(t)      # the runner tracks each arrival by its task object, and traces repeat ids
+            dispatch(mqtt_client, MQTT_TOPIC, env, t, sensors)
+            runner.record_dispatch(t, time.perf_counter() - began)
+        metrics.count("dispatched")
+
+    return dispatch_at
+
+
+def connect(tasks, offline_source=None):
+    """
+    MQTT client and strategy source for a run, with task details loaded into
+    `tasks` and the sensor fleet set. Online: broker, BaSyx and AAS registry;
+    offline: everything from `offline_source`, publishes only recorded.
+    """
+    if offline_source is None:
+        # --- MQTT setup ---
+        mqtt_client = mqtt.Client()
+        mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        mqtt_client.loop_start()
+
+        # --- Strategy cache (updated by BaSyx MQTT events) ---
+        strategy_source = StrategyCache(mqtt_client).start()
+
+        # Load task details (one bulk request, cached on disk)
+        load_tasks(tasks, BASE_SUBMODEL_URL)
+
+        # Sensor fleet: packaged camera AASX files, overridden/extended by the AAS registry
+        specs = {spec.name: spec for spec in load_sensor_specs()}
+        try:
+            specs.update((spec.name, spec) for spec in fetch_sensor_specs_from_registry())
+        except Exception as e:
+            print(f"⚠️ AAS registry unavailable ({e}), using the packaged sensor AASX files")
+        set_sensor_specs(list(specs.values()))
     else:
-        print(f"⚠️ Unknown strategy '{current_strategy}', defaulting to fair.")
-        dispatch_fair_task(mqtt_client,MQTT_TOPIC,env, t, sensors)
-
-env.run(until=SIM_TIME)
-mqtt_client.loop_stop()
-mqtt_client.disconnect()
+        # --- Offline: in-memory tasks/strategy, publishes are only recorded ---
+        source = InMemoryTaskSource.from_file(offline_source)
+        mqtt_client = RecordingMqttClient()
+        strategy_source = source.strategy.start()
+        source.load_tasks(tasks)
+
+    # Priorities are computed once here, not on every (re)request
+    precompute_priorities(tasks)
+    return mqtt_client, strategy_source
+
+
+def main(offline_source=None, realtime=False, frame_source=None, trace=None, synthetic_rate=None, metrics_port=None):
+    tasks = [{"id": task_id} for task_id in TASK_IDS]
+    mqtt_client, strategy_source = connect(tasks, offline_source)
+
+    # --- Result publisher (bounded queue, background thread) ---
+    publisher = ResultPublisher(mqtt_client, MQTT_TOPIC, batch_size=RESULT_BATCH_SIZE,
+                                batch_interval=RESULT_BATCH_INTERVAL, max_queue=RESULT_QUEUE_SIZE,
+                                policy=RESULT_POLICY, qos=1).start()
+
+    # --- Real-time mode: wall-clock pacing, tasks grab frames from the sensors ---
+    runner = None
+    if realtime:
+        env = simpy.rt.RealtimeEnvironment(factor=1.0, strict=False)
+        runner = RealtimeRunner(env, source_spec=frame_source)
+    else:
+        env = simpy.Environment()
+
+    # --- Scheduler metrics, reported on METRICS_TOPIC while the simulation runs ---
+    metrics = SchedulerMetrics(env)
+    reporter = MetricsReporter(metrics, mqtt_client, METRICS_TOPIC, METRICS_INTERVAL).start()
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = serve_metrics(metrics, metrics_port)
+        print(f"📈 Prometheus metrics on :{metrics_port}/metrics")
+
+    # --- Arrivals: the fixed plan, a JSONL/CSV trace (streamed) or an endless synthetic stream ---
+    sim_time = SIM_TIME
+    if trace is not None:
+        arrivals = read_arrivals(trace, {task["id"]: task for task in tasks})
+        sim_time = None  # replay the whole trace
+    elif synthetic_rate is not None:
+        arrivals = synthetic_arrivals(rate=synthetic_rate)
+    else:
+        arrivals = ARRIVAL_PLAN
+
+    run_simulation(tasks, arrivals, strategy_source, publisher, sim_time=sim_time, env=env)
+    energy = energy_used(env)
+
+    strategy_source.stop()
+    reporter.stop()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    publisher.close()
+    print(f"📤 Results: {publisher.stats()}")
+    if energy is not None:
+        print(f"🔋 Sensor energy (energy-aware dispatch): {energy:.2f} J")
+    print(metrics.render_prometheus())
+    if runner is not None:
+        runner.close()
+        print(f"⏱️ Real-time: {runner.stats()}")
+    mqtt_client.loop_stop()
+    mqtt_client.disconnect()
+    return mqtt_client
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sensor scheduling agent")
+    parser.add_argument("--offline", metavar="SOURCE",
+                        help="run without BaSyx/MQTT, loading tasks from an .aasx, AAS .json or .jsonl file")
+    parser.add_argument("--realtime", action="store_true",
+                        help="run on the wall clock; tasks grab frames from the sensors' video endpoints")
+    parser.add_argument("--frame-source", metavar="SPEC",
+                        help="with --realtime, grab from this frame source instead (e.g. synthetic, opencv:0, file:clip.mp4)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="replay arrivals from a .jsonl/.csv trace (time,id[,safety,realtime,duration,...]) instead of ARRIVAL_PLAN")
+    parser.add_argument("--synthetic", metavar="RATE", type=float,
+                        help="generate Poisson arrivals at RATE tasks/s until SIM_TIME instead of ARRIVAL_PLAN")
+    parser.add_argument("--metrics-port", metavar="PORT", type=int, nargs="?", const=METRICS_PORT,
+                        help=f"serve Prometheus /metrics on PORT (default {METRICS_PORT}) while the simulation runs")
+    args = parser.parse_args()
+    main(args.offline, args.realtime, args.frame_source, args.trace, args.synthetic, args.metrics_port)
@@ -0,0 +1,318 @@
+import json
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import simpy.rt
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from arrivals import task_from_record, synthetic_arrivals
+from compute import precompute_priorities
+from metrics import SchedulerMetrics, MetricsReporter, METRICS_TOPIC, METRICS_INTERVAL
+from publisher import ResultPublisher
+from realtime import RealtimeRunner, realtime_lag
+from scheduling_agent import (TASK_IDS, MQTT_TOPIC, RESULT_BATCH_SIZE, RESULT_BATCH_INTERVAL, RESULT_QUEUE_SIZE,
+                              RESULT_POLICY, connect, make_dispatcher)
+from sensors import SensorPool, get_sensor_specs
+from task_log import StreamingStats
+
+# --- Parameters ---
+TASK_TOPIC = "simulation/task/submit"  # JSON task record or array of records
+HTTP_HOST = "0.0.0.0"
+HTTP_PORT = 8090
+INTAKE_QUEUE_SIZE = 1000     # accepted but not yet dispatched; beyond this submissions are rejected
+MAX_IN_SYSTEM = 500          # dispatched but not finished; intake pauses while this many are running
+INTAKE_INTERVAL = 0.01       # wall seconds between intake drains in the SimPy environment
+TIME_FACTOR = 1.0            # wall seconds per simulated second
+THROUGHPUT_TARGET = 200.0    # sustained tasks/s the service must finish, checked by --benchmark
+RETRY_AFTER = 1              # seconds, sent with 429 responses
+
+
+# --- Result publisher that also counts finished tasks ---
+class ServicePublisher(ResultPublisher):
+    def __init__(self, *args, on_finish=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_finish = on_finish
+
+    def submit(self, result):
+        accepted = super().submit(result)
+        if accepted:
+            self.on_finish()
+        return accepted
+
+
+# --- Scheduling service ---
+class SchedulingService:
+    """
+    Scheduling agent as a long-running service. One real-time SimPy
+    environment advances continuously on its own thread; tasks submitted
+    over REST or MQTT go into a bounded intake queue and an intake process
+    in the environment dispatches them every INTAKE_INTERVAL through the
+    current strategy, as long as fewer than MAX_IN_SYSTEM are running.
+    A batch is queued whole or not at all: a full intake queue rejects it
+    (HTTP 429) instead of growing, so a client can safely retry. stop()
+    dispatches what was already accepted before it returns.
+    """
+
+    def __init__(self, offline_source=None, time_factor=TIME_FACTOR, real_work=False, frame_source=None,
+                 intake_size=INTAKE_QUEUE_SIZE, max_in_system=MAX_IN_SYSTEM, task_topic=TASK_TOPIC):
+        self.known = {task_id: {"id": task_id} for task_id in TASK_IDS}
+        self.mqtt_client, self.strategy_source = connect(list(self.known.values()), offline_source)
+        self.task_topic = task_topic
+        self.max_in_system = max_in_system
+        self.intake = queue.Queue(maxsize=intake_size)
+
+        self.env = simpy.rt.RealtimeEnvironment(factor=time_factor, strict=False)
+        self.runner = RealtimeRunner(self.env, source_spec=frame_source) if real_work or frame_source else None
+        self.metrics = SchedulerMetrics(self.env)
+        self.publisher = ServicePublisher(self.mqtt_client, MQTT_TOPIC, batch_size=RESULT_BATCH_SIZE,
+                                          batch_interval=RESULT_BATCH_INTERVAL, max_queue=RESULT_QUEUE_SIZE,
+                                          policy=RESULT_POLICY, qos=1, on_finish=self._finished)
+        self.reporter = MetricsReporter(self.metrics, self.mqtt_client, METRICS_TOPIC, METRICS_INTERVAL)
+        sensors = SensorPool.build(self.env, get_sensor_specs(), self.metrics)
+        self.dispatch_at = make_dispatcher(self.env, sensors, self.strategy_source, self.publisher, self.metrics)
+
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.dispatched = 0
+        self.finished = 0
+        self.intake_latency = StreamingStats()   # wall seconds from submit to dispatch
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+    # --- Lifecycle ---
+    def start(self):
+        self.publisher.start()
+        self.reporter.start()
+        self.mqtt_client.message_callback_add(self.task_topic, self._on_message)
+        self.mqtt_client.subscribe(self.task_topic)
+        self.env.process(self._intake())
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self.env.run, name="simpy-env", daemon=True)
+        self._thread.start()
+        print(f"🚦 Scheduling service running (intake {self.intake.maxsize}, max in system {self.max_in_system})")
+        return self
+
+    def stop(self, timeout=None):
+        """Stop accepting, dispatch the accepted backlog, let tasks finish, flush results."""
+        self.mqtt_client.unsubscribe(self.task_topic)
+        self.mqtt_client.message_callback_remove(self.task_topic)
+        with self._submit_lock:
+            self._stopping = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Only left over if `timeout` cut the drain short
+        dropped = 0
+        while True:
+            try:
+                self.intake.get_nowait()
+            except queue.Empty:
+                break
+            dropped += 1
+        if dropped:
+            with self._lock:
+                self.dropped += dropped
+            print(f"⚠️ {dropped} accepted task(s) dropped at shutdown")
+        self.strategy_source.stop()
+        self.reporter.stop()
+        self.publisher.close()
+        if self.runner is not None:
+            self.runner.close()
+        self.mqtt_client.loop_stop()
+        self.mqtt_client.disconnect()
+
+    # --- Intake (any thread) ---
+    def submit(self, record):
+        """Queue one task record: "accepted", "rejected" (intake full or stopping) or "invalid"."""
+        outcome = self.submit_many([record])
+        if outcome["accepted"]:
+            return "accepted"
+        return "invalid" if outcome["invalid"] else "rejected"
+
+    def submit_many(self, records):
+        """
+        Queue a batch of task records, all or none. {"accepted": n,
+        "rejected": n, "invalid": [{"index": i, "error": ...}, ...]}; any
+        invalid record or too little room in the intake queue rejects the
+        whole batch.
+        """
+        tasks = []
+        invalid = []
+        for index, record in enumerate(records):
+            try:
+                tasks.append(dict(task_from_record(record, self.known)))
+            except ValueError as e:
+                invalid.append({"index": index, "error": str(e)})
+        if invalid:
+            with self._lock:
+                self.invalid += len(invalid)
+            return {"accepted": 0, "rejected": 0, "invalid": invalid}
+        # Only the intake process takes from the queue, so room checked under this lock stays free
+        with self._submit_lock:
+            if self._stopping or self.intake.maxsize - self.intake.qsize() < len(tasks):
+                with self._lock:
+                    self.rejected += len(tasks)
+                return {"accepted": 0, "rejected": len(tasks), "invalid": []}
+            submitted = time.monotonic()
+            for task in tasks:
+                self.intake.put_nowait((submitted, task))
+        with self._lock:
+            self.accepted += len(tasks)
+        return {"accepted": len(tasks), "rejected": 0, "invalid": []}
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            body = json.loads(msg.payload)
+        except ValueError:
+            print(f"⚠️ Ignoring non-JSON task message on {msg.topic}")
+            return
+        self.submit_many(body if isinstance(body, list) else [body])
+
+    # --- SimPy side ---
+    def _finished(self):
+        with self._lock:
+            self.finished += 1
+
+    def _intake(self):
+        env = self.env
+        interval = INTAKE_INTERVAL / env.factor
+        # After stop() no new tasks arrive; keep going until the accepted backlog is dispatched
+        while not self._stopping or not self.intake.empty():
+            batch = []
+            room = self.max_in_system - (self.dispatched - self.finished)
+            while len(batch) < room:
+                try:
+                    batch.append(self.intake.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                tasks = [task for _, task in batch]
+                precompute_priorities(tasks)
+                now = time.monotonic()
+                for submitted, task in batch:
+                    self.intake_latency.add(now - submitted)
+                    self.dispatch_at(task)
+                self.dispatched += len(batch)
+            yield env.timeout(interval)
+
+    # --- Reporting ---
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        with self._lock:
+            counts = {"accepted": self.accepted, "rejected": self.rejected, "invalid": self.invalid,
+                      "dropped": self.dropped, "finished": self.finished}
+        counts.update({
+            "queued": self.intake.qsize(),
+            "in_system": self.dispatched - counts["finished"],
+            "dispatched": self.dispatched,
+            "throughput": counts["finished"] / elapsed if elapsed else 0.0,
+            "lag": realtime_lag(self.env),
+            "intake_latency": self.intake_latency.summary() if self.intake_latency.count else {"count": 0},
+            "results": self.publisher.stats(),
+        })
+        return counts
+
+
+def create_app(service):
+    @asynccontextmanager
+    async def lifespan(app):
+        service.start()
+        yield
+        service.stop()
+
+    app = FastAPI(title="Scheduling service", lifespan=lifespan)
+
+    @app.post("/tasks", status_code=202)
+    async def submit_tasks(request: Request):
+        try:
+            body = await request.json()
+        except ValueError as e:
+            return JSONResponse({"detail": f"Malformed JSON: {e}"}, status_code=400)
+        if not isinstance(body, (dict, list)):
+            return JSONResponse({"detail": "Expected a task record or an array of task records"}, status_code=422)
+        records = body if isinstance(body, list) else [body]
+        outcome = service.submit_many(records)
+        if outcome["rejected"]:
+            return JSONResponse(outcome, status_code=429, headers={"Retry-After": str(RETRY_AFTER)})
+        if outcome["invalid"]:
+            return JSONResponse(outcome, status_code=422)
+        return outcome
+
+    @app.get("/stats")
+    async def stats():
+        return service.stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return service.metrics.render_prometheus()
+
+    return app
+
+
+# --- Sustained-throughput benchmark ---
+def benchmark(service, rate=THROUGHPUT_TARGET, seconds=10.0, seed=0):
+    """
+    Submit synthetic tasks at `rate` per wall second for `seconds` and
+    report how many were offered, accepted, rejected and finished per
+    second. The target is met when the service keeps up with what was
+    actually offered (Poisson arrivals offer somewhat more or less than
+    `rate`) without rejecting anything.
+    """
+    service.start()
+    arrivals = synthetic_arrivals(seed=seed, rate=rate)
+    began = time.monotonic()
+    for arrival_time, task in arrivals:
+        if arrival_time >= seconds:
+            break
+        delay = began + arrival_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        service.submit(task)
+    submitted_for = time.monotonic() - began
+    finished_then = service.stats()["finished"]
+    service.stop()
+    stats = service.stats()
+    result = {
+        "target": rate,
+        "offered": (stats["accepted"] + stats["rejected"]) / submitted_for,
+        "accepted": stats["accepted"] / submitted_for,
+        "finished": finished_then / submitted_for,
+        "rejected": stats["rejected"],
+        "intake_latency": stats["intake_latency"],
+    }
+    result["target_met"] = result["finished"] >= 0.95 * result["offered"] and stats["rejected"] == 0
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Sensor scheduling agent as a long-running service")
+    parser.add_argument("--offline", metavar="SOURCE",
+                        help="run without BaSyx/MQTT, loading tasks from an .aasx, AAS .json or .jsonl file")
+    parser.add_argument("--time-factor", type=float, default=TIME_FACTOR,
+                        help="wall seconds per simulated second (e.g. 0.01 runs task durations 100x faster)")
+    parser.add_argument("--real-work", action="store_true",
+                        help="tasks grab frames from the sensors' video endpoints instead of waiting their duration")
+    parser.add_argument("--frame-source", metavar="SPEC",
+                        help="grab frames from this frame source instead (implies --real-work)")
+    parser.add_argument("--host", default=HTTP_HOST)
+    parser.add_argument("--port", type=int, default=HTTP_PORT)
+    parser.add_argument("--benchmark", metavar="RATE", type=float, nargs="?", const=THROUGHPUT_TARGET,
+                        help=f"submit synthetic tasks at RATE/s (default {THROUGHPUT_TARGET:g}) instead of serving")
+    parser.add_argument("--duration", type=float, default=10.0, help="benchmark length in seconds")
+    args = parser.parse_args()
+
+    service = SchedulingService(args.offline, args.time_factor, args.real_work, args.frame_source)
+    if args.benchmark is not None:
+        print(f"📈 Benchmark: {benchmark(service, args.benchmark, args.duration)}")
+    else:
+        uvicorn.run(create_app(service), host=args.host, port=args.port)
@@ -0,0 +1,187 @@
+import os
+
+import simpy
+
+from aasx import read_submodels
+from task_loader import get_session, REQUEST_TIMEOUT
+
+# --- Parameters ---
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# Sensor name -> camera AAS package
+SENSOR_AASX = {
+    "CSI": os.path.join(_HERE, "CSI_Camera.aasx"),
+    "USB": os.path.join(_HERE, "USB_camera.aasx"),
+}
+REGISTRY_URL = "http://localhost:8082"
+GENERAL_SUBMODEL = "GeneralInformation"
+DATA_SUBMODEL = "DataModel"
+# Optional submodel with Capacity, Capabilities ("a,b") and Fallback ("USB,...")
+SCHEDULING_SUBMODEL = "Scheduling"
+# Fallback chain when the AAS does not state one (H0 -> H1: CSI falls back to USB)
+DEFAULT_FALLBACK = {"CSI": ("USB",)}
+PRIMARY_SENSOR = "CSI"
+
+
+def _split(value):
+    return tuple(v.strip() for v in (value or "").split(",") if v.strip())
+
+
+def sensor_name(aas_id_short):
+    """Scheduler name of a camera shell: "CSI_camera" -> "CSI"."""
+    return aas_id_short.split("_", 1)[0].upper()
+
+
+# --- Sensor description read from its AAS ---
+class SensorSpec:
+    def __init__(self, name, capacity=1, capabilities=(), fallback=None, endpoint=None, aas_id=None):
+        self.name = name
+        self.capacity = capacity
+        self.capabilities = frozenset(capabilities)
+        self.fallback = tuple(fallback) if fallback is not None else DEFAULT_FALLBACK.get(name, ())
+        self.endpoint = endpoint
+        self.aas_id = aas_id
+
+    @classmethod
+    def from_submodels(cls, name, submodels, aas_id=None):
+        """`submodels` maps submodel idShort to its BaSyx-style element dicts."""
+        def values(id_short):
+            return {e["idShort"]: e.get("value") for e in submodels.get(id_short, [])}
+
+        general = values(GENERAL_SUBMODEL)
+        data = values(DATA_SUBMODEL)
+        scheduling = values(SCHEDULING_SUBMODEL)
+        capabilities = {"camera"}
+        for value in (general.get("ConnectMethod"), general.get("SensorType"), data.get("DataLifetime")):
+            if value:
+                capabilities.add(value.strip().lower())
+        if data.get("DataEndpoint"):
+            capabilities.add("video")
+        capabilities.update(c.lower() for c in _split(scheduling.get("Capabilities")))
+        fallback = _split(scheduling.get("Fallback")) if scheduling.get("Fallback") else None
+        return cls(name, capacity=int(scheduling.get("Capacity") or 1), capabilities=capabilities,
+                   fallback=fallback, endpoint=data.get("DataEndpoint"), aas_id=aas_id)
+
+    @classmethod
+    def from_aasx(cls, name, path):
+        submodels = read_submodels(path, (GENERAL_SUBMODEL, DATA_SUBMODEL, SCHEDULING_SUBMODEL))
+        return cls.from_submodels(name, submodels)
+
+
+def load_sensor_specs(sources=SENSOR_AASX):
+    specs = []
+    for name, path in sources.items():
+        try:
+            specs.append(SensorSpec.from_aasx(name, path))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Could not read sensor AAS {path} ({e}), using defaults for {name}")
+            specs.append(SensorSpec(name, capabilities={"camera"}))
+    return specs
+
+
+def fetch_sensor_specs_from_registry(registry_url=REGISTRY_URL):
+    """One SensorSpec per shell descriptor in the BaSyx AAS registry."""
+    session = get_session()
+    specs = []
+    params = {}
+    while True:
+        response = session.get(f"{registry_url}/shell-descriptors", params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        body = response.json()
+        for shell in body.get("result", []):
+            submodels = {}
+            for descriptor in shell.get("submodelDescriptors", []):
+                if descriptor.get("idShort") not in (GENERAL_SUBMODEL, DATA_SUBMODEL, SCHEDULING_SUBMODEL):
+                    continue
+                endpoints = descriptor.get("endpoints") or []
+                if not endpoints:
+                    continue
+                href = endpoints[0]["protocolInformation"]["href"].rstrip("/")
+                elements = session.get(f"{href}/submodel-elements", timeout=REQUEST_TIMEOUT)
+                elements.raise_for_status()
+                submodels[descriptor["idShort"]] = elements.json().get("result", [])
+            if GENERAL_SUBMODEL not in submodels and DATA_SUBMODEL not in submodels:
+                continue  # not a sensor shell
+            specs.append(SensorSpec.from_submodels(sensor_name(shell.get("idShort", "")), submodels,
+                                                   aas_id=shell.get("id")))
+        cursor = body.get("paging_metadata", {}).get("cursor")
+        if not cursor:
+            break
+        params = {"cursor": cursor}
+    return specs
+
+
+SENSOR_SPECS = None
+
+
+def set_sensor_specs(specs):
+    global SENSOR_SPECS
+    SENSOR_SPECS = specs
+    return specs
+
+
+def get_sensor_specs():
+    if SENSOR_SPECS is None:
+        set_sensor_specs(load_sensor_specs())
+    return SENSOR_SPECS
+
+
+# --- Sensor class ---
+class Sensor:
+    def __init__(self, env, name, metrics=None, capacity=1, capabilities=(), fallback=(), endpoint=None):
+        self.env = env
+        self.name = name
+        self.capabilities = frozenset(capabilities)
+        self.fallback = tuple(fallback)
+        self.endpoint = endpoint
+        if metrics is not None:
+            self.resource = metrics.resource(name, capacity=capacity)
+        else:
+            self.resource = simpy.PreemptiveResource(env, capacity=capacity)
+
+
+# --- Sensor pool indexed by name and capability ---
+class SensorPool(list):
+    """
+    The sensors of one simulation. Still a list (dispatchers iterate it),
+    plus dict indexes so name / capability / fallback lookups are O(1).
+    """
+
+    def __init__(self, sensors=()):
+        super().__init__()
+        self.by_name = {}
+        self.by_capability = {}
+        for sensor in sensors:
+            self.add(sensor)
+
+    @classmethod
+    def build(cls, env, specs, metrics=None):
+        return cls(Sensor(env, spec.name, metrics, spec.capacity, spec.capabilities, spec.fallback, spec.endpoint)
+                   for spec in specs)
+
+    def add(self, sensor):
+        self.append(sensor)
+        self.by_name[sensor.name] = sensor
+        for capability in sensor.capabilities:
+            self.by_capability.setdefault(capability, []).append(sensor)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def with_capability(self, capability):
+        return self.by_capability.get(capability, [])
+
+    def fallback_for(self, sensor):
+        """First sensor of `sensor`'s fallback chain that is in this pool, else None."""
+        for name in sensor.fallback:
+            candidate = self.by_name.get(name)
+            if candidate is not None:
+                return candidate
+        return None
+
+    def match(self, task, default=PRIMARY_SENSOR):
+        """Sensor for a task: task["sensor"] by name, else first with task["capability"], else `default`."""
+        sensor = self.by_name.get(task.get("sensor"))
+        if sensor is None and task.get("capability"):
+            candidates = self.by_capability.get(task["capability"])
+            sensor = candidates[0] if candidates else None
+        return sensor or self.by_name.get(default) or self[0]
@@ -0,0 +1,121 @@
+import json
+import threading
+
+from task_loader import get_session, REQUEST_TIMEOUT
+
+# --- Parameters ---
+STRATEGY_URL = "http://localhost:8081/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vMTIzMF8zMjEwXzUwNTJfODI5Nw/submodel-elements/simpy"
+# BaSyx submodel repository events: sm-repository/<repo>/submodels/<b64 id>/submodelElements/<idShortPath>/<event>
+STRATEGY_TOPIC = "sm-repository/+/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vMTIzMF8zMjEwXzUwNTJfODI5Nw/submodelElements/simpy/+"
+STRATEGY_TTL = 30.0
+DEFAULT_STRATEGY = "fair"
+
+
+# --- Strategy fetcher ---
+def fetch_strategy_from_basyx(strategy_url=STRATEGY_URL):
+    try:
+        response = get_session().get(strategy_url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        return data.get("value", DEFAULT_STRATEGY).strip().lower()
+    except Exception as e:
+        print(f"❌ Failed to fetch scheduling strategy: {e}")
+        return DEFAULT_STRATEGY
+
+
+# --- Push-based strategy cache ---
+class StrategyCache:
+    """
+    Keeps the current scheduling strategy in memory. The value is read once
+    over HTTP, then updated from BaSyx MQTT change events; get() never does
+    I/O. While the broker connection is down (or without a client), a
+    background thread re-reads the value every `ttl` seconds, and after a
+    reconnect the topic is subscribed again and the value re-read once.
+    """
+
+    def __init__(self, mqtt_client=None, strategy_url=STRATEGY_URL, topic=STRATEGY_TOPIC, ttl=STRATEGY_TTL):
+        self.mqtt_client = mqtt_client
+        self.strategy_url = strategy_url
+        self.topic = topic
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._strategy = None
+        self._connected = False
+        self._refresh = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._set(fetch_strategy_from_basyx(self.strategy_url))
+        if self.mqtt_client is not None:
+            self._chain("on_connect", self._on_connect)
+            self._chain("on_disconnect", self._on_disconnect)
+            self._connected = self.mqtt_client.is_connected()
+            self.mqtt_client.message_callback_add(self.topic, self._on_message)
+            self.mqtt_client.subscribe(self.topic)
+        self._thread = threading.Thread(target=self._poll, name="strategy-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self._refresh.set()
+        if self.mqtt_client is not None:
+            self.mqtt_client.unsubscribe(self.topic)
+            self.mqtt_client.message_callback_remove(self.topic)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _chain(self, name, callback):
+        """Add `callback` to the client's `name` callback without replacing one set elsewhere."""
+        previous = getattr(self.mqtt_client, name)
+
+        def chained(*args):
+            if previous is not None:
+                previous(*args)
+            callback(*args)
+
+        setattr(self.mqtt_client, name, chained)
+
+    def _set(self, strategy):
+        with self._lock:
+            self._strategy = strategy
+
+    # ---------- broker (paho network thread, must not block) ----------
+    def _on_connect(self, client, *args):
+        # Subscriptions do not survive a reconnect; events missed meanwhile are caught by one re-read
+        client.subscribe(self.topic)
+        if not self._connected:
+            print("🔌 Strategy events connected")
+        self._connected = True
+        self._refresh.set()
+
+    def _on_disconnect(self, client, *args):
+        if self._connected:
+            print(f"⚠️ Strategy events lost, polling {self.strategy_url} every {self.ttl:g}s")
+        self._connected = False
+
+    def _on_message(self, client, userdata, msg):
+        if msg.topic.endswith("/deleted"):
+            self._set(DEFAULT_STRATEGY)
+            return
+        try:
+            data = json.loads(msg.payload)
+            self._set(str(data.get("value", DEFAULT_STRATEGY)).strip().lower())
+        except (ValueError, AttributeError):
+            # Event without a usable body: re-read the element off this thread
+            self._refresh.set()
+
+    # ---------- fallback refresh (own thread) ----------
+    def _poll(self):
+        while True:
+            requested = self._refresh.wait(self.ttl)
+            self._refresh.clear()
+            if self._stopping:
+                return
+            if requested or not self._connected:
+                self._set(fetch_strategy_from_basyx(self.strategy_url))
+
+    def get(self):
+        strategy = self._strategy
+        return strategy if strategy is not None else DEFAULT_STRATEGY
@@ -3,16 +3,25 @@ import time
 import threading
 import os
 import cv2
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
 from fastapi.responses import StreamingResponse
 import uvicorn
 import typing
+from basyx_sync import BasyxSync, BASYX_ENV_URL
+from camera_stream import FrameBroadcaster, StreamProfile, snapshot_response
+from frame_source import OpenCVSource, source_from_env
+from graphql_cache import generate_graphql_api
+from rest_cache import ResponseCache
+from telemetry import StreamStats, TelemetryWriter
 
 # ========== 配置 ==========
 PUBLISH_TO_LAN = True  # ← ← ← 控制是否发布到局域网
 
 CAMERA_INDEXES = [0, 1]
-caps = [cv2.VideoCapture(i) for i in CAMERA_INDEXES]
+# 每个摄像头一个采集/编码线程，所有客户端共享同一帧
+# 可用环境变量 CAMERA0_SOURCE / CAMERA1_SOURCE 替换帧源（synthetic:..., file:...）
+streams = [FrameBroadcaster(source_from_env(f"CAMERA{i}_SOURCE", OpenCVSource(i)), name=f"camera{i}")
+           for i in CAMERA_INDEXES]
 
 # ========== 传感器类 ==========
 class Sensor(aas_middleware.Submodel):
@@ -92,31 +101,44 @@ data_model = aas_middleware.DataModel.from_models(example_sdv)
 middleware = aas_middleware.Middleware()
 middleware.load_data_model("sdv", data_model, persist_instances=True)
 middleware.generate_rest_api_for_data_model("sdv")
-middleware.generate_graphql_api_for_data_model("sdv")
+generate_graphql_api(middleware, "sdv")
 
-app = middleware.app  # 继承 FastAPI app
+# 轮询的看板直接拿缓存的 JSON（带 ETag），写入时失效
+rest_cache = ResponseCache(middleware).install()
+# 只把变化的子模型元素推送到 BaSyx AAS 环境，写入在 DEBOUNCE 窗口内合并；仅在设置了 BASYX_ENV_URL 时启用
+basyx_sync = BasyxSync(middleware, ["sdv"]).install() if BASYX_ENV_URL else None
+
+# ========== 实时遥测：由前置摄像头的实际帧更新 Camera 子模型 ==========
+camera_stats = StreamStats()
+streams[0].add_observer(camera_stats.observe)
+TelemetryWriter(middleware, "sdv", example_sdv.id, "camera", camera_stats).install()
 
-# ========== 视频流处理函数 ==========
-def generate_frames(cam_index: int):
-    cap = caps[cam_index]
-    while cap.isOpened():
-        success, frame = cap.read()
-        if not success:
-            break
-        else:
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+app = middleware.app  # 继承 FastAPI app
 
 # ========== 路由定义 ==========
 @app.get("/sdv/camera0/video_feed")
-def video_feed_0():
-    return StreamingResponse(generate_frames(0), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed_0(fps: typing.Optional[float] = None, width: typing.Optional[int] = None,
+                       quality: typing.Optional[int] = None, adaptive: bool = True):
+    profile = StreamProfile(fps, width, quality, adaptive)
+    return StreamingResponse(streams[0].async_frames(profile), media_type="multipart/x-mixed-replace; boundary=frame")
 
 @app.get("/sdv/camera1/video_feed")
-def video_feed_1():
-    return StreamingResponse(generate_frames(1), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed_1(fps: typing.Optional[float] = None, width: typing.Optional[int] = None,
+                       quality: typing.Optional[int] = None, adaptive: bool = True):
+    profile = StreamProfile(fps, width, quality, adaptive)
+    return StreamingResponse(streams[1].async_frames(profile), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@app.get("/sdv/camera0/snapshot.jpg")
+async def snapshot_0(after: typing.Optional[int] = None, if_none_match: typing.Optional[str] = Header(None)):
+    return await snapshot_response(streams[0], if_none_match, after)
+
+@app.get("/sdv/camera1/snapshot.jpg")
+async def snapshot_1(after: typing.Optional[int] = None, if_none_match: typing.Optional[str] = Header(None)):
+    return await snapshot_response(streams[1], if_none_match, after)
+
+@app.get("/basyx_sync/stats")
+async def basyx_sync_stats():
+    return basyx_sync.stats() if basyx_sync is not None else {"enabled": False}
 
 # ========== 启动服务 ==========
 if __name__ == "__main__":
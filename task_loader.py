@@ -0,0 +1,190 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Parameters ---
+BASE_SUBMODEL_URL = "http://localhost:8081/submodels/aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vOTAyM18yMjEwXzUwNTJfOTY0Mg/submodel-elements"
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".task_cache.json")
+PAGE_LIMIT = 500
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = 5
+CACHE_TTL = 300.0            # seconds a cached task table without ETag/Last-Modified is used as is
+
+# --- Shared keep-alive session ---
+_session = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+
+# --- Utility: Map safety levels A-D to 1-4 ---
+def map_safety_level(level_str):
+    mapping = {"A": 1, "B": 2, "C": 3, "D": 4}
+    return mapping.get(level_str.upper(), 1)
+
+
+# --- Parse one task SubmodelElementCollection ---
+def parse_task_element(data):
+    description = ""
+    for d in data.get("description", []):
+        if d.get("language") == "en":
+            description = d.get("text")
+
+    duration = safety = realtime = None
+    safety_str = "A"
+
+    for prop in data.get("value", []):
+        if prop.get("idShort") == "Duration":
+            duration = float(prop["value"])
+        elif prop.get("idShort") == "Safety_level":
+            safety_str = prop["value"]
+            safety = map_safety_level(safety_str)
+        elif prop.get("idShort") == "Timing_criticality":
+            realtime = int(prop["value"])
+
+    return {
+        "safety": safety,
+        "safety_str": safety_str,
+        "realtime": realtime,
+        "duration": duration,
+        "description": description
+    }
+
+
+# --- Fetch a single task (per-element endpoint) ---
+def fetch_task_data_from_basyx(task_id, base_url=BASE_SUBMODEL_URL):
+    response = get_session().get(f"{base_url}/{task_id}", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return parse_task_element(response.json())
+
+
+# --- Disk cache ---
+def _read_cache(base_url, cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("url") != base_url:
+        return None
+    return cache
+
+
+def _write_cache(cache_file, base_url, etag, last_modified, task_data):
+    if not cache_file:
+        return
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "url": base_url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "tasks": task_data
+        }, f)
+    os.replace(tmp_file, cache_file)
+
+
+# --- Bulk fetch of the whole task submodel ---
+def fetch_all_tasks_from_basyx(base_url=BASE_SUBMODEL_URL, cache_file=CACHE_FILE, cache_ttl=CACHE_TTL):
+    """
+    Load every task SubmodelElementCollection with one (paged) GET on the
+    submodel-elements endpoint. The parsed result is cached on disk and
+    revalidated with If-None-Match / If-Modified-Since on the next start;
+    without validators it is used as is for `cache_ttl` seconds. If BaSyx
+    cannot be reached, the cached table is used whatever its age.
+    Returns a dict mapping idShort to the parsed task values.
+    """
+    session = get_session()
+    cache = _read_cache(base_url, cache_file)
+
+    headers = {}
+    if cache is not None:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+        if not headers and time.time() - cache.get("fetched_at", 0) < cache_ttl:
+            return cache["tasks"]
+
+    task_data = {}
+    params = {"limit": PAGE_LIMIT}
+    etag = last_modified = None
+    first_page = True
+    while True:
+        try:
+            response = session.get(base_url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if cache is None:
+                raise
+            print(f"⚠️ BaSyx unreachable ({e}), using the cached task table")
+            return cache["tasks"]
+        if first_page and response.status_code == 304 and cache is not None:
+            return cache["tasks"]
+        response.raise_for_status()
+        if first_page:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            headers = {}
+            first_page = False
+
+        body = response.json()
+        elements = body.get("result", []) if isinstance(body, dict) else body
+        for element in elements:
+            if element.get("modelType", "SubmodelElementCollection") == "SubmodelElementCollection":
+                task_data[element["idShort"]] = parse_task_element(element)
+
+        cursor = body.get("paging_metadata", {}).get("cursor") if isinstance(body, dict) else None
+        if not cursor:
+            break
+        params = {"limit": PAGE_LIMIT, "cursor": cursor}
+
+    _write_cache(cache_file, base_url, etag, last_modified, task_data)
+    return task_data
+
+
+# --- Concurrent per-element fallback ---
+def fetch_tasks_concurrently(task_ids, base_url=BASE_SUBMODEL_URL, max_workers=MAX_WORKERS):
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_task_data_from_basyx, task_id, base_url): task_id for task_id in task_ids}
+        for future, task_id in futures.items():
+            try:
+                results[task_id] = future.result()
+            except Exception as e:
+                print(f"❌ Failed to load task {task_id}: {e}")
+    return results
+
+
+# --- Load task details into the task list ---
+def load_tasks(tasks, base_url=BASE_SUBMODEL_URL, cache_file=CACHE_FILE):
+    try:
+        task_data = fetch_all_tasks_from_basyx(base_url, cache_file)
+    except Exception as e:
+        print(f"⚠️ Bulk task load failed ({e}), falling back to per-task requests")
+        task_data = {}
+
+    missing = [task["id"] for task in tasks if task["id"] not in task_data]
+    if missing:
+        task_data.update(fetch_tasks_concurrently(missing, base_url))
+
+    for task in tasks:
+        values = task_data.get(task["id"])
+        if values is None:
+            continue
+        task.update(values)
+        print(f"✔️ Task loaded: {task}")
+    return tasks
@@ -0,0 +1,164 @@
+import math
+from array import array
+
+# --- Parameters ---
+TASK_LOG_CAPACITY = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# --- Streaming quantile sketch (P² algorithm, Jain & Chlamtac) ---
+class P2Quantile:
+    """Constant-memory estimate of one quantile; add() and value() are O(1)."""
+
+    def __init__(self, q):
+        self.q = q
+        self.n = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        self.n += 1
+        if self.n <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+        h, pos = self.heights, self.positions
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + step * (h[i + step] - h[i]) / (pos[i + step] - pos[i])
+                h[i] = candidate
+                pos[i] += step
+
+    def _parabolic(self, i, step):
+        h, pos = self.heights, self.positions
+        return h[i] + step / (pos[i + 1] - pos[i - 1]) * (
+            (pos[i] - pos[i - 1] + step) * (h[i + 1] - h[i]) / (pos[i + 1] - pos[i])
+            + (pos[i + 1] - pos[i] - step) * (h[i] - h[i - 1]) / (pos[i] - pos[i - 1])
+        )
+
+    def value(self):
+        if self.n == 0:
+            return math.nan
+        if self.n <= 5:
+            return self.heights[min(int(round(self.q * (self.n - 1))), self.n - 1)]
+        return self.heights[2]
+
+
+class StreamingStats:
+    """Count, mean and P² quantiles of one latency series."""
+
+    def __init__(self, quantiles=QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self.max = -math.inf
+        self.sketches = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, x):
+        self.count += 1
+        self.mean += (x - self.mean) / self.count
+        if x > self.max:
+            self.max = x
+        for sketch in self.sketches.values():
+            sketch.add(x)
+
+    def summary(self):
+        result = {"count": self.count, "mean": self.mean, "max": self.max if self.count else 0.0}
+        for q, sketch in self.sketches.items():
+            result[f"p{round(q * 100)}"] = sketch.value()
+        return result
+
+
+# --- Bounded task-finish log ---
+class TaskLog:
+    """
+    Ring buffer of the last `capacity` finished tasks in array-backed columns,
+    plus streaming wait/response statistics over every task ever logged.
+    Wait is arrival to first start and response arrival to finish, whatever
+    the preemption mode; the last start is kept alongside.
+    """
+
+    def __init__(self, capacity=TASK_LOG_CAPACITY):
+        self.capacity = capacity
+        self.task_ids = [None] * capacity
+        self.arrival = array("d", bytes(8 * capacity))
+        self.first_start = array("d", bytes(8 * capacity))
+        self.start = array("d", bytes(8 * capacity))
+        self.finish = array("d", bytes(8 * capacity))
+        self.sensor = array("B", bytes(capacity))
+        self.preemptions = array("H", bytes(2 * capacity))
+        self.sensor_names = []
+        self._sensor_index = {}
+        self.total = 0
+        self.wait = StreamingStats()
+        self.response = StreamingStats()
+
+    def _sensor_id(self, name):
+        index = self._sensor_index.get(name)
+        if index is None:
+            index = self._sensor_index[name] = len(self.sensor_names)
+            self.sensor_names.append(name)
+        return index
+
+    def record(self, task_id, sensor, arrival, start, finish, preemptions=0, first_start=None):
+        """`start` is the last (re)start of the task, `first_start` its first one (default `start`)."""
+        if first_start is None:
+            first_start = start
+        i = self.total % self.capacity
+        self.task_ids[i] = task_id
+        self.arrival[i] = arrival
+        self.first_start[i] = first_start
+        self.start[i] = start
+        self.finish[i] = finish
+        self.sensor[i] = self._sensor_id(sensor)
+        self.preemptions[i] = min(preemptions, 0xFFFF)
+        self.total += 1
+        self.wait.add(first_start - arrival)
+        self.response.add(finish - arrival)
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def __iter__(self):
+        """Oldest to newest retained entries as dicts."""
+        first = self.total - len(self)
+        for n in range(first, self.total):
+            i = n % self.capacity
+            yield {
+                "task_id": self.task_ids[i],
+                "sensor": self.sensor_names[self.sensor[i]],
+                "arrival_time": self.arrival[i],
+                "first_start_time": self.first_start[i],
+                "start_time": self.start[i],
+                "finish_time": round(self.finish[i], 2),
+                "preemptions": self.preemptions[i],
+            }
+
+    def stats(self):
+        return {"wait": self.wait.summary(), "response": self.response.summary()}
+
+    def clear(self, capacity=None):
+        self.__init__(capacity or self.capacity)
+
+
+# 全局任务完成日志（环形缓冲 + 流式延迟统计，task_finish_log.stats()）, shared by all dispatchers
+task_finish_log = TaskLog(TASK_LOG_CAPACITY)
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# ========== 配置 ==========
+TELEMETRY_INTERVAL = 2.0     # seconds between write-back checks
+STATS_WINDOW = 2.0           # rolling window for fps / bitrate
+MIN_SPAN = 1.0               # rates are only reported from a window at least this long ...
+MIN_FRAMES = 5               # ... holding at least this many frames
+IDLE_GAP = 1.0               # a longer gap between frames means capture paused; the window restarts
+WARMUP = 0.5                 # frames right after (re)start are not counted (sources flush buffered frames)
+SAMPLE_EVERY = 5             # colour statistics from every Nth frame
+SAMPLE_SIZE = (64, 36)       # downsampled frame used for colour statistics
+# Minimum change before a field is written again: relative for rates/sizes,
+# absolute (in percent points) for the 0-100 light measures
+RELATIVE_THRESHOLDS = {"frame_rate": 0.05, "bitrate": 0.10, "jpeg_file_size": 0.10}
+ABSOLUTE_THRESHOLDS = {"brightness": 1.0, "lightness": 1.0, "luminosity": 1.0}
+
+COLOR_NAMES = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "gray": (128, 128, 128),
+    "red": (200, 30, 30), "green": (30, 160, 30), "blue": (30, 60, 200),
+    "yellow": (220, 200, 40), "orange": (230, 130, 30), "brown": (120, 80, 40),
+    "purple": (120, 50, 150), "cyan": (40, 190, 200), "pink": (230, 140, 170),
+}
+
+
+def _color_name(rgb):
+    return min(COLOR_NAMES, key=lambda name: sum((a - b) ** 2 for a, b in zip(rgb, COLOR_NAMES[name])))
+
+
+def _format_bytes(value, suffix=""):
+    if value >= 1024 * 1024:
+        return f"{value / (1024 * 1024):.2f} MB{suffix}"
+    return f"{value / 1024:.2f} kB{suffix}"
+
+
+FORMATTERS = {
+    "bitrate": lambda v: _format_bytes(v, "/s"),
+    "jpeg_file_size": _format_bytes,
+    "frame_rate": lambda v: round(v, 2),
+    "brightness": lambda v: round(v, 2),
+    "lightness": lambda v: round(v, 2),
+    "luminosity": lambda v: round(v, 2),
+}
+
+
+# ========== 采集侧增量统计 ==========
+class StreamStats:
+    """
+    Frame observer for FrameBroadcaster.add_observer(). Keeps a rolling
+    fps / encoded bitrate and colour statistics from a downsampled frame,
+    so the per-frame cost in the capture loop stays small. The rate window
+    restarts when capture resumes after a pause, and snapshot() reports
+    nothing until it covers MIN_SPAN seconds and MIN_FRAMES frames.
+    """
+
+    def __init__(self, window=STATS_WINDOW, sample_every=SAMPLE_EVERY, sample_size=SAMPLE_SIZE):
+        self.window = window
+        self.sample_every = sample_every
+        self.sample_size = sample_size
+        self._frames = deque()  # (timestamp, jpeg bytes)
+        self._bytes = 0
+        self._last_frame = None
+        self._warm_until = 0.0
+        self._count = 0
+        self._resolution = None
+        self._light = {}
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._frames and now - self._frames[0][0] > self.window:
+            self._bytes -= self._frames.popleft()[1]
+
+    def observe(self, frame, jpeg):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_frame is None or now - self._last_frame > IDLE_GAP:
+                # Capture (re)started: the old window says nothing about the new run
+                self._frames.clear()
+                self._bytes = 0
+                self._warm_until = now + WARMUP
+            self._last_frame = now
+            if now >= self._warm_until:
+                self._frames.append((now, len(jpeg)))
+                self._bytes += len(jpeg)
+            self._trim(now)
+            self._count += 1
+            sample = self._count % self.sample_every == 1 or self.sample_every == 1
+        if not sample:
+            return
+        small = cv2.resize(frame, self.sample_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        b, g, r = small[..., 0], small[..., 1], small[..., 2]
+        high = small.max(axis=2)
+        low = small.min(axis=2)
+        light = {
+            "luminosity": float((0.299 * r + 0.587 * g + 0.114 * b).mean() / 2.55),
+            "brightness": float(high.mean() / 2.55),
+            "lightness": float(((high + low) / 2).mean() / 2.55),
+            "average_rgb_color": _color_name((r.mean(), g.mean(), b.mean())),
+        }
+        with self._lock:
+            self._resolution = f"{frame.shape[1]}x{frame.shape[0]}"
+            self._light = light
+
+    def snapshot(self):
+        """Current values, or None while the window is too short to measure rates from."""
+        with self._lock:
+            self._trim(time.monotonic())
+            if len(self._frames) < MIN_FRAMES:
+                return None
+            span = self._frames[-1][0] - self._frames[0][0]
+            if span < MIN_SPAN:
+                return None
+            values = {
+                "frame_rate": (len(self._frames) - 1) / span,
+                "bitrate": self._bytes / max(span, 1e-6),
+                "jpeg_file_size": self._bytes / len(self._frames),
+                "resolution": self._resolution,
+            }
+            values.update(self._light)
+            return values
+
+
+# ========== 回写到 AAS 数据模型 ==========
+class TelemetryWriter:
+    """
+    Periodically writes StreamStats into one submodel of a persisted AAS
+    through the middleware, skipping fields whose change is below threshold.
+    """
+
+    def __init__(self, middleware, data_model_name, model_id, attribute, stats, interval=TELEMETRY_INTERVAL):
+        self.middleware = middleware
+        self.data_model_name = data_model_name
+        self.model_id = model_id
+        self.attribute = attribute
+        self.stats = stats
+        self.interval = interval
+        self.writes = 0
+        self._last = {}
+        self._task = None
+
+    def install(self):
+        self.middleware.add_callback("on_start_up", self.start)
+        self.middleware.add_callback("on_shutdown", self.stop)
+        return self
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def changed_fields(self, values):
+        changed = {}
+        for field, value in values.items():
+            if value is None:
+                continue
+            last = self._last.get(field)
+            if last is None:
+                changed[field] = value
+            elif field in RELATIVE_THRESHOLDS:
+                if abs(value - last) > RELATIVE_THRESHOLDS[field] * max(abs(last), 1e-9):
+                    changed[field] = value
+            elif field in ABSOLUTE_THRESHOLDS:
+                if abs(value - last) > ABSOLUTE_THRESHOLDS[field]:
+                    changed[field] = value
+            elif value != last:
+                changed[field] = value
+        return changed
+
+    async def write(self, values):
+        model = await self.middleware.get_value(self.data_model_name, self.model_id)
+        submodel = getattr(model, self.attribute)
+        written = {}
+        for field, value in values.items():
+            if field not in type(submodel).model_fields:
+                continue
+            setattr(submodel, field, FORMATTERS.get(field, lambda v: v)(value))
+            written[field] = value
+        if written:
+            await self.middleware.update_value(model, self.data_model_name, self.model_id)
+            self._last.update(written)
+            self.writes += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            values = self.stats.snapshot()
+            if values is None:
+                continue
+            changed = self.changed_fields(values)
+            if not changed:
+                continue
+            try:
+                await self.write(changed)
+            except Exception as e:
+                print(f"⚠️ Telemetry update for {self.model_id}.{self.attribute} failed: {e}")
@@ -1,6 +1,9 @@
 import typing
 import aas_middleware
 
+from graphql_cache import generate_graphql_api
+from rest_cache import ResponseCache
+
 
 class Video(aas_middleware.SubmodelElementCollection):
     URL:str
@@ -44,13 +47,27 @@ csi_camera = Camera(
 )
 
 data_model = aas_middleware.DataModel.from_models(csi_camera)
-basyx_object_store = aas_middleware.formatting.BasyxFormatter().serialize(data_model)
 formatter = aas_middleware.formatting.AasJsonFormatter()
-json_aas = formatter.serialize(data_model)
+
+# Formatter output is only built on first access (test.basyx_object_store / test.json_aas)
+_SERIALIZED = {
+    "basyx_object_store": lambda: aas_middleware.formatting.BasyxFormatter().serialize(data_model),
+    "json_aas": lambda: formatter.serialize(data_model),
+}
+
+
+def __getattr__(name):
+    if name not in _SERIALIZED:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = _SERIALIZED[name]()
+    return value
+
+
 middleware = aas_middleware.Middleware()
 middleware.load_data_model("example", data_model, persist_instances=True)
 middleware.generate_rest_api_for_data_model("example")
-middleware.generate_graphql_api_for_data_model("example")
+generate_graphql_api(middleware, "example")
+rest_cache = ResponseCache(middleware).install()
 
 
 if __name__ == "__main__":
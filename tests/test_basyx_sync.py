@@ -0,0 +1,85 @@
+import copy
+
+import pytest
+
+from basyx_sync import b64_id, diff_elements, _apply
+
+
+def prop(id_short, value):
+    return {"idShort": id_short, "modelType": "Property", "valueType": "xs:string", "value": value}
+
+
+def collection(id_short, *children, **extra):
+    return {"idShort": id_short, "modelType": "SubmodelElementCollection", "value": list(children), **extra}
+
+
+def apply_all(elements, ops):
+    elements = copy.deepcopy(elements)
+    for op, path, element in ops:
+        _apply(elements, op, path, element)
+    return elements
+
+
+OLD = [
+    prop("frame_rate", "25"),
+    prop("resolution", "640x480"),
+    collection("video", prop("bitrate", "1 MB/s"), prop("quality", "95")),
+    collection("lens", prop("focal", "4mm"), description=[{"language": "en", "text": "lens"}]),
+]
+
+
+def test_identical_lists_have_no_ops():
+    assert diff_elements(OLD, copy.deepcopy(OLD)) == []
+
+
+def test_changed_property_is_a_single_put():
+    new = copy.deepcopy(OLD)
+    new[0]["value"] = "30"
+    assert diff_elements(OLD, new) == [("put", "frame_rate", new[0])]
+
+
+def test_collection_with_same_children_is_diffed_by_path():
+    new = copy.deepcopy(OLD)
+    new[2]["value"][1]["value"] = "70"
+    assert diff_elements(OLD, new) == [("put", "video.quality", new[2]["value"][1])]
+
+
+def test_reshaped_collection_is_replaced_whole():
+    new = copy.deepcopy(OLD)
+    new[2]["value"].append(prop("codec", "mjpeg"))
+    assert diff_elements(OLD, new) == [("put", "video", new[2])]
+
+
+def test_collection_metadata_change_replaces_it():
+    new = copy.deepcopy(OLD)
+    new[3]["description"][0]["text"] = "wide lens"
+    assert diff_elements(OLD, new) == [("put", "lens", new[3])]
+
+
+def test_added_and_removed_elements():
+    new = copy.deepcopy(OLD)
+    del new[1]
+    new.append(prop("luminosity", "42.0"))
+    ops = diff_elements(OLD, new)
+    assert ("post", "luminosity", new[-1]) in ops
+    assert ("delete", "resolution", None) in ops
+    assert len(ops) == 2
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda e: e[0].update(value="30"),
+    lambda e: e[2]["value"][0].update(value="2 MB/s"),
+    lambda e: e[2]["value"].append(prop("codec", "mjpeg")),
+    lambda e: e.pop(1),
+    lambda e: e.append(collection("extra", prop("a", "1"))),
+    lambda e: e.clear(),
+])
+def test_applying_the_diff_reproduces_the_new_list(mutate):
+    new = copy.deepcopy(OLD)
+    mutate(new)
+    ops = diff_elements(OLD, new)
+    assert sorted(apply_all(OLD, ops), key=lambda e: e["idShort"]) == sorted(new, key=lambda e: e["idShort"])
+
+
+def test_b64_id_is_unpadded_base64url():
+    assert b64_id("https://example.com/ids/sm/1") == "aHR0cHM6Ly9leGFtcGxlLmNvbS9pZHMvc20vMQ"
@@ -0,0 +1,42 @@
+import pytest
+
+from offline import InMemoryTaskSource, RecordingMqttClient, record_to_task
+
+
+@pytest.mark.parametrize("value, letter, level", [
+    ("A", "A", 1), ("b", "B", 2), (3, "C", 3), (4, "D", 4),
+])
+def test_record_safety_accepts_letters_and_levels(value, letter, level):
+    task = record_to_task({"safety": value, "realtime": 1, "duration": 0.5})
+    assert (task["safety_str"], task["safety"]) == (letter, level)
+
+
+@pytest.mark.parametrize("value", [5, 0, "E", "AB", True, 2.0])
+def test_record_safety_rejects_unknown_values(value):
+    with pytest.raises(ValueError, match="safety level"):
+        record_to_task({"safety": value})
+
+
+def test_recording_client_keeps_only_the_newest_messages():
+    client = RecordingMqttClient(keep=3)
+    for i in range(10):
+        client.publish("t", str(i))
+    assert client.published == 10
+    assert [payload for _, payload in client.messages] == ["7", "8", "9"]
+
+    client = RecordingMqttClient(keep=0)
+    client.publish("t", "x")
+    assert client.published == 1 and not client.messages
+
+
+def test_load_tasks_names_tasks_with_unset_fields():
+    source = InMemoryTaskSource({
+        "Task1": {"safety": 1, "realtime": 2, "duration": 0.5},
+        "Task2": {"safety": None, "realtime": 1, "duration": None},
+    })
+    with pytest.raises(ValueError, match=r"Task2 \(safety, duration\)"):
+        source.load_tasks([{"id": "Task1"}, {"id": "Task2"}])
+
+    tasks = [{"id": "Task1"}]
+    source.load_tasks(tasks)
+    assert tasks[0]["duration"] == 0.5
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+from publisher import ResultPublisher, serialize_result, MQTT_ERR_NO_CONN
+
+
+class FakeClient:
+    def __init__(self, rc=0):
+        self.rc = rc
+        self.messages = []
+
+    def publish(self, topic, payload, qos=0):
+        self.messages.append((topic, payload, qos))
+        info = type("Info", (), {})()
+        info.rc = self.rc
+        return info
+
+
+def result(i):
+    return (f"Task{i}", "CSI", float(i), "", "A", 1, 1.0)
+
+
+def sent_ids(client):
+    ids = []
+    for _, payload, _ in client.messages:
+        body = json.loads(payload)
+        ids.extend(r["task_id"] for r in (body if isinstance(body, list) else [body]))
+    return ids
+
+
+def test_serialize_result_is_valid_json():
+    assert json.loads(serialize_result("T\"1", "CSI", 1.5, None, "B", 2, 0.25)) == {
+        "task_id": "T\"1", "sensor": "CSI", "finish_time": 1.5, "description": "",
+        "safety": "B", "realtime": 2, "duration": 0.25}
+
+
+def test_drop_oldest_keeps_the_newest_results():
+    client = FakeClient()
+    publisher = ResultPublisher(client, "results", max_queue=3, policy="drop-oldest")
+    for i in range(5):
+        publisher.submit(result(i))
+    publisher.start().close()
+
+    assert sent_ids(client) == ["Task2", "Task3", "Task4"]
+    stats = publisher.stats()
+    assert stats["dropped"] == 2 and stats["sent"] == 3 and stats["pending"] == 0
+
+
+def test_spill_writes_overflow_to_disk_and_replays_it(tmp_path):
+    client = FakeClient()
+    publisher = ResultPublisher(client, "results", max_queue=2, policy="spill", spill_dir=str(tmp_path))
+    for i in range(5):
+        publisher.submit(result(i))
+    assert os.path.dirname(publisher.spill_file) == str(tmp_path)
+    assert publisher.stats()["spilled"] == 3
+    publisher.start().close()
+
+    assert sorted(sent_ids(client)) == [f"Task{i}" for i in range(5)]
+    assert publisher.stats()["sent"] == 5
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_batches_go_out_as_json_arrays():
+    client = FakeClient()
+    publisher = ResultPublisher(client, "results", batch_size=10, batch_interval=0.01)
+    for i in range(4):
+        publisher.submit(result(i))
+    publisher.start().close()
+    assert sent_ids(client) == [f"Task{i}" for i in range(4)]
+    assert json.loads(client.messages[0][1])[0]["task_id"] == "Task0"
+
+
+def test_publish_return_codes_are_accounted():
+    for rc, qos, counter in ((MQTT_ERR_NO_CONN, 0, "failed"), (MQTT_ERR_NO_CONN, 1, "deferred"), (7, 1, "failed")):
+        publisher = ResultPublisher(FakeClient(rc), "results", qos=qos)
+        publisher.submit(result(0))
+        publisher.start().close()
+        stats = publisher.stats()
+        assert stats[counter] == 1 and stats["sent"] == 0, (rc, qos)
+
+
+def test_submit_after_close_is_rejected():
+    client = FakeClient()
+    publisher = ResultPublisher(client, "results", max_queue=1, policy="block").start()
+    publisher.close()
+    publisher.submit(result(0))
+    publisher.submit(result(1))
+    assert publisher.stats()["rejected"] == 2
+    assert client.messages == []
+
+
+def test_failed_spill_replay_is_kept_and_retried(tmp_path, monkeypatch):
+    import publisher as publisher_module
+    monkeypatch.setattr(publisher_module, "SPILL_RETRY_INTERVAL", 0.05)
+
+    class FlakyClient(FakeClient):
+        def __init__(self):
+            super().__init__()
+            self.calls = 0
+
+        def publish(self, topic, payload, qos=0):
+            self.calls += 1
+            if self.calls == 2:
+                raise OSError("broker gone")
+            return super().publish(topic, payload, qos)
+
+    client = FlakyClient()
+    publisher = ResultPublisher(client, "results", max_queue=1, policy="spill", spill_dir=str(tmp_path))
+    for i in range(4):
+        publisher.submit(result(i))
+    publisher.start()
+    deadline = time.monotonic() + 5
+    while publisher.stats()["sent"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert publisher._thread.is_alive()
+    publisher.close()
+
+    assert sorted(sent_ids(client)) == [f"Task{i}" for i in range(4)]
+    stats = publisher.stats()
+    assert stats["sent"] == 4 and stats["failed"] == 0 and stats["pending"] == 0
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+import simpy.rt
+
+from realtime import RealtimeRunner
+
+
+def test_repeated_task_ids_are_separate_arrivals():
+    env = simpy.rt.RealtimeEnvironment(factor=0.01, strict=False)
+    runner = RealtimeRunner(env, max_workers=2, poll_interval=0.001)
+    sensor = SimpleNamespace(name="CSI")
+    runner._grabbers[sensor.name] = lambda n, cancel=None: n
+    task = {"id": "Task1", "realtime": 1, "duration": 0.01, "frames": 1}
+
+    arrivals = [dict(task), dict(task)]
+    for arrival in arrivals:
+        runner.record_dispatch(arrival, 0.0)
+    assert len(runner._arrivals) == 2
+
+    for arrival in arrivals:
+        env.process(runner.run(arrival, sensor, arrival["duration"]))
+    env.run()
+    runner.close()
+
+    assert runner.wait.count == 2
+    assert runner._arrivals == {}
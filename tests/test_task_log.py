@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import pytest
+
+from task_log import P2Quantile, StreamingStats, TaskLog
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+@pytest.mark.parametrize("distribution", ["uniform", "exponential", "lognormal"])
+def test_p2_quantile_tracks_sorted_data(q, distribution):
+    rng = np.random.default_rng(0)
+    data = getattr(rng, distribution)(size=20000)
+    sketch = P2Quantile(q)
+    for x in data:
+        sketch.add(float(x))
+    exact = float(np.quantile(data, q))
+    spread = float(np.quantile(data, 0.999) - np.quantile(data, 0.001))
+    assert sketch.value() == pytest.approx(exact, abs=0.02 * spread)
+
+
+def test_p2_quantile_small_samples_are_exact():
+    sketch = P2Quantile(0.5)
+    assert math.isnan(sketch.value())
+    for x in (5.0, 1.0, 3.0):
+        sketch.add(x)
+    assert sketch.value() == 3.0
+
+
+def test_streaming_stats_summary():
+    stats = StreamingStats()
+    for x in range(1, 101):
+        stats.add(float(x))
+    summary = stats.summary()
+    assert summary["count"] == 100
+    assert summary["mean"] == pytest.approx(50.5)
+    assert summary["max"] == 100.0
+    assert summary["p50"] == pytest.approx(50.5, abs=2)
+
+
+def test_task_log_wait_is_measured_to_first_start():
+    log = TaskLog(capacity=4)
+    log.record("Task1", "CSI", arrival=1.0, start=2.0, finish=3.0)
+    log.record("Task2", "USB", arrival=0.0, start=5.0, finish=6.5, preemptions=2, first_start=0.5)
+
+    stats = log.stats()
+    assert stats["wait"]["count"] == 2
+    assert stats["wait"]["mean"] == pytest.approx((1.0 + 0.5) / 2)
+    assert stats["response"]["mean"] == pytest.approx((2.0 + 6.5) / 2)
+
+    entries = list(log)
+    assert entries[1] == {"task_id": "Task2", "sensor": "USB", "arrival_time": 0.0, "first_start_time": 0.5,
+                          "start_time": 5.0, "finish_time": 6.5, "preemptions": 2}
+    assert entries[0]["first_start_time"] == entries[0]["start_time"] == 2.0
+
+
+def test_task_log_ring_buffer_keeps_the_newest_entries():
+    log = TaskLog(capacity=3)
+    for i in range(5):
+        log.record(f"Task{i}", "CSI", arrival=i, start=i, finish=i + 1)
+    assert len(log) == 3
+    assert [entry["task_id"] for entry in log] == ["Task2", "Task3", "Task4"]
+    assert log.stats()["response"]["count"] == 5
+
+    log.clear(capacity=10)
+    assert len(log) == 0 and log.capacity == 10